@@ -1,7 +1,7 @@
 """
 CRM API Routes - Customers and Vendors
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -136,6 +136,23 @@ async def list_vendors(
     )
 
 
+@router.get("/vendors/search", response_model=List[VendorResponse])
+async def search_vendors(
+    q: str = "",
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """Search active vendors by name"""
+    vendor_service = VendorService(db)
+    return vendor_service.search(
+        current_user.selected_branch.id,
+        current_user.business_id,
+        q,
+        limit
+    )
+
+
 @router.post("/vendors", response_model=VendorResponse, dependencies=[Depends(PermissionChecker(["vendors:create"]))])
 async def create_vendor(
     vendor_data: VendorCreate,
@@ -1,7 +1,7 @@
 """
 Inventory API Routes - Products and Categories
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -102,6 +102,18 @@ async def list_products(
     return product_service.get_by_branch(current_user.selected_branch.id, include_inactive)
 
 
+@router.get("/products/search", response_model=List[ProductResponse])
+async def search_products(
+    q: str = "",
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """Search active products by name or SKU"""
+    product_service = ProductService(db)
+    return product_service.search(current_user.selected_branch.id, q, limit)
+
+
 @router.get("/products/low-stock", response_model=List[ProductResponse])
 async def list_low_stock_products(
     db: Session = Depends(get_db),
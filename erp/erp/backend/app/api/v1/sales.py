@@ -119,7 +119,7 @@ async def get_next_invoice_number(
 ):
     """Get next invoice number"""
     sales_service = SalesService(db)
-    return {"next_number": sales_service.get_next_number(current_user.business_id)}
+    return {"next_number": sales_service.preview_next_number(current_user.business_id)}
 
 
 # Credit Notes
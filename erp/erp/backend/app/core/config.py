@@ -16,6 +16,8 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./erp.db"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
     
     # Security
     SECRET_KEY: str = "your-super-secret-key-change-in-production-min-32-chars"
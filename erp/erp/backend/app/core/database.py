@@ -1,20 +1,32 @@
 """
 Database Configuration
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func, insert, inspect, select, text, update, MetaData
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateColumn, CreateTable
 from typing import Generator
 import os
 
 from app.core.config import settings
 
 # Create engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=settings.DEBUG
-)
+if "sqlite" in settings.DATABASE_URL:
+    engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        echo=settings.DEBUG
+    )
+else:
+    # Pooled connections let concurrent work (e.g. the dashboard fan-out)
+    # run on separate connections
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        echo=settings.DEBUG
+    )
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -23,6 +35,13 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def dialect_insert(db: Session, model):
+    """INSERT for the session's database that supports on_conflict_do_* upserts"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
 def get_db() -> Generator[Session, None, None]:
     """
     Dependency that provides a database session.
@@ -35,6 +54,12 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+# Indexes dropped from the models in favour of a differently named one
+_REPLACED_INDEXES = {
+    "sales_invoices": ("ix_sales_invoices_business_id",),
+}
+
+
 def init_db():
     """Initialize database tables"""
     # Import all models to register them with Base
@@ -42,8 +67,96 @@ def init_db():
         Business, User, Branch, Permission, Role, UserBranchRole, RolePermission,
         Account, JournalVoucher, LedgerEntry, Budget, BudgetItem, FixedAsset,
         Customer, Vendor, Category, Product, StockAdjustment,
-        SalesInvoice, SalesInvoiceItem, Payment, CreditNote, CreditNoteItem,
+        SalesInvoice, SalesInvoiceItem, Payment, CreditNote, CreditNoteItem, DailySalesRollup,
         PurchaseBill, PurchaseBillItem, DebitNote, DebitNoteItem,
-        Employee, PayrollConfig, Payslip, BankAccount, FundTransfer, Expense
+        Employee, PayrollConfig, Payslip, BankAccount, FundTransfer, Expense,
+        Counter
     )
     Base.metadata.create_all(bind=engine)
+    
+    # create_all skips tables that already exist, so bring older databases
+    # up to the current models
+    with engine.begin() as conn:
+        _upgrade_schema(conn)
+
+
+def _upgrade_schema(conn):
+    """Apply model changes to tables created by an earlier release.
+    
+    Each step checks the live schema first, so this is a no-op on a database
+    that is already current.
+    """
+    from app.models import SalesInvoice, PurchaseBill, DailySalesRollup
+    
+    for model in (SalesInvoice, PurchaseBill):
+        _add_missing_columns(conn, model.__table__)
+        # Rows written before is_open existed have no flag; derive it from status
+        conn.execute(update(model.__table__).where(model.is_open.is_(None)).values(
+            is_open=model.status.in_(["Unpaid", "Partial", "Overdue"])
+        ))
+    
+    # The sales chart reads only the rollup, so fill a new one from the
+    # invoices already on file
+    if conn.execute(select(DailySalesRollup.id).limit(1)).first() is None:
+        conn.execute(insert(DailySalesRollup).from_select(
+            ["business_id", "branch_id", "day", "total"],
+            select(
+                SalesInvoice.business_id,
+                SalesInvoice.branch_id,
+                SalesInvoice.invoice_date,
+                func.sum(SalesInvoice.total_amount)
+            ).group_by(SalesInvoice.business_id, SalesInvoice.branch_id, SalesInvoice.invoice_date)
+        ))
+    
+    _sync_indexes(conn)
+
+
+def _sync_indexes(conn):
+    """Drop indexes the models have replaced and create any that are missing"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for name in _REPLACED_INDEXES.get(table.name, ()):
+            if name in existing:
+                conn.execute(text(f"DROP INDEX {name}"))
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+
+
+def _add_missing_columns(conn, table):
+    """Add the model's columns that the table lacks"""
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    missing = [column for column in table.columns if column.name not in existing]
+    if not missing:
+        return
+    
+    if conn.dialect.name == "sqlite" and any(column.computed is not None for column in missing):
+        # SQLite cannot add a STORED generated column to an existing table
+        _rebuild_sqlite_table(conn, table, existing)
+    else:
+        for column in missing:
+            conn.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}"
+            ))
+
+
+def _rebuild_sqlite_table(conn, table, existing: set):
+    """Recreate a SQLite table from its model and copy the rows across.
+    
+    The new table is built under a temporary name and renamed into place, so
+    foreign keys in other tables keep pointing at the right name. The app
+    does not turn on SQLite foreign key enforcement, so dropping the old
+    table leaves the rows that reference it untouched.
+    """
+    metadata = MetaData()
+    for other in Base.metadata.sorted_tables:
+        other.to_metadata(metadata)
+    rebuilt = table.to_metadata(metadata, name=f"{table.name}_rebuilt")
+    columns = ", ".join(column.name for column in table.columns if column.name in existing)
+    
+    conn.execute(text(f"DROP TABLE IF EXISTS {rebuilt.name}"))
+    conn.execute(CreateTable(rebuilt))
+    conn.execute(text(f"INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {rebuilt.name} RENAME TO {table.name}"))
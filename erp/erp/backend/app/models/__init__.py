@@ -5,7 +5,7 @@ from datetime import datetime, date
 from decimal import Decimal
 from sqlalchemy import (
     Column, Integer, String, Text, Boolean, DateTime, Date, Numeric,
-    ForeignKey, Enum, Table, Index, UniqueConstraint, CheckConstraint
+    ForeignKey, Enum, Table, Index, UniqueConstraint, CheckConstraint, Computed, text
 )
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.ext.declarative import declarative_base
@@ -338,7 +338,7 @@ class LedgerEntry(Base):
     branch = relationship("Branch")
     
     __table_args__ = (
-        Index('ix_ledger_entries_account_id', 'account_id'),
+        Index('ix_ledger_entries_account_id', 'account_id', postgresql_include=['debit', 'credit']),
         Index('ix_ledger_entries_transaction_date', 'transaction_date'),
     )
 
@@ -489,7 +489,9 @@ class SalesInvoice(Base):
     vat_amount = Column(Numeric(15, 2), default=Decimal("0.00"))
     total_amount = Column(Numeric(15, 2), default=Decimal("0.00"))
     paid_amount = Column(Numeric(15, 2), default=Decimal("0.00"))
+    outstanding = Column(Numeric(15, 2), Computed("total_amount - paid_amount", persisted=True))
     status = Column(String(20), default=InvoiceStatus.PENDING.value)
+    is_open = Column(Boolean, default=False)  # True while status is Unpaid/Partial/Overdue
     notes = Column(Text, nullable=True)
     customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
     branch_id = Column(Integer, ForeignKey('branches.id', ondelete='CASCADE'), nullable=False)
@@ -510,7 +512,9 @@ class SalesInvoice(Base):
     
     __table_args__ = (
         UniqueConstraint('invoice_number', 'business_id', name='uq_sales_invoice_number'),
-        Index('ix_sales_invoices_business_id', 'business_id'),
+        Index('ix_sales_invoices_business_id_id', 'business_id', 'id'),
+        Index('ix_sales_invoices_business_branch_date', 'business_id', 'branch_id', 'invoice_date'),
+        Index('ix_sales_invoices_open', 'branch_id', 'outstanding', postgresql_where=text('is_open'), sqlite_where=text('is_open')),
     )
 
 
@@ -576,6 +580,7 @@ class CreditNote(Base):
     
     __table_args__ = (
         UniqueConstraint('credit_note_number', 'business_id', name='uq_credit_note_number'),
+        Index('ix_credit_notes_business_id_id', 'business_id', 'id'),
     )
 
 
@@ -599,6 +604,21 @@ class CreditNoteItem(Base):
         return self.quantity * self.price
 
 
+class DailySalesRollup(Base):
+    """Per-day sales totals, maintained as invoices are created"""
+    __tablename__ = 'daily_sales_rollups'
+    
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    total = Column(Numeric(15, 2), default=Decimal("0.00"))
+    branch_id = Column(Integer, ForeignKey('branches.id', ondelete='CASCADE'), nullable=False)
+    business_id = Column(Integer, ForeignKey('businesses.id', ondelete='CASCADE'), nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('business_id', 'branch_id', 'day', name='uq_daily_sales_rollup'),
+    )
+
+
 # ==================== PURCHASES MODELS ====================
 
 class PurchaseBill(Base):
@@ -614,7 +634,9 @@ class PurchaseBill(Base):
     vat_amount = Column(Numeric(15, 2), default=Decimal("0.00"))
     total_amount = Column(Numeric(15, 2), default=Decimal("0.00"))
     paid_amount = Column(Numeric(15, 2), default=Decimal("0.00"))
+    outstanding = Column(Numeric(15, 2), Computed("total_amount - paid_amount", persisted=True))
     status = Column(String(20), default=InvoiceStatus.PENDING.value)
+    is_open = Column(Boolean, default=False)  # True while status is Unpaid/Partial/Overdue
     notes = Column(Text, nullable=True)
     vendor_id = Column(Integer, ForeignKey('vendors.id', ondelete='CASCADE'), nullable=False)
     branch_id = Column(Integer, ForeignKey('branches.id', ondelete='CASCADE'), nullable=False)
@@ -635,6 +657,8 @@ class PurchaseBill(Base):
     __table_args__ = (
         UniqueConstraint('bill_number', 'business_id', name='uq_purchase_bill_number'),
         Index('ix_purchase_bills_business_id', 'business_id'),
+        Index('ix_purchase_bills_business_branch_date', 'business_id', 'branch_id', 'bill_date'),
+        Index('ix_purchase_bills_open', 'branch_id', 'outstanding', postgresql_where=text('is_open'), sqlite_where=text('is_open')),
     )
 
 
@@ -734,6 +758,7 @@ class Expense(Base):
     
     __table_args__ = (
         UniqueConstraint('expense_number', 'business_id', name='uq_expense_number'),
+        Index('ix_expenses_business_branch_date', 'business_id', 'branch_id', 'expense_date'),
     )
 
 
@@ -876,6 +901,27 @@ class FundTransfer(Base):
     __table_args__ = (
         UniqueConstraint('transfer_number', 'business_id', name='uq_fund_transfer_number'),
         CheckConstraint('from_account_id != to_account_id', name='ck_different_accounts'),
+        Index('ix_fund_transfers_from_account_date', 'from_account_id', 'transfer_date'),
+        Index('ix_fund_transfers_to_account_date', 'to_account_id', 'transfer_date'),
+    )
+
+
+# ==================== NUMBERING ====================
+
+class Counter(Base):
+    """Per-business document number counter"""
+    __tablename__ = 'counters'
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)
+    last_value = Column(Integer, nullable=False, default=0)
+    business_id = Column(Integer, ForeignKey('businesses.id', ondelete='CASCADE'), nullable=False)
+    
+    # Relationships
+    business = relationship("Business")
+    
+    __table_args__ = (
+        UniqueConstraint('business_id', 'kind', name='uq_counter_business_kind'),
     )
 
 
@@ -967,7 +1013,7 @@ __all__ = [
     # Inventory
     'Category', 'Product', 'StockAdjustment',
     # Sales
-    'SalesInvoice', 'SalesInvoiceItem', 'Payment', 'CreditNote', 'CreditNoteItem',
+    'SalesInvoice', 'SalesInvoiceItem', 'Payment', 'CreditNote', 'CreditNoteItem', 'DailySalesRollup',
     # Purchases
     'PurchaseBill', 'PurchaseBillItem', 'DebitNote', 'DebitNoteItem',
     # Expenses
@@ -976,6 +1022,8 @@ __all__ = [
     'Employee', 'PayrollConfig', 'Payslip',
     # Banking
     'BankAccount', 'FundTransfer',
+    # Numbering
+    'Counter',
     # Budgeting
     'Budget', 'BudgetItem',
     # Fixed Assets
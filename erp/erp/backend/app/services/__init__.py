@@ -13,6 +13,7 @@ from app.services.accounting_service import (
 )
 from app.services.hr_service import EmployeeService, PayrollConfigService, PayslipService
 from app.services.banking_service import BankAccountService, FundTransferService
+from app.services.counter_service import CounterService
 
 __all__ = [
     'UserService',
@@ -40,4 +41,5 @@ __all__ = [
     'PayslipService',
     'BankAccountService',
     'FundTransferService',
+    'CounterService',
 ]
@@ -2,12 +2,13 @@
 Banking Service - Bank Accounts, Fund Transfers, Reconciliation
 """
 from typing import Optional, List, Dict
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, load_only, aliased
+from sqlalchemy import func, insert, update, exists, or_, select, union_all
 from decimal import Decimal
 from datetime import date
 from app.models import BankAccount, FundTransfer, LedgerEntry, Account
 from app.schemas import BankAccountCreate, FundTransferCreate
+from app.services.counter_service import CounterService
 
 
 class BankAccountService:
@@ -22,6 +23,20 @@ class BankAccountService:
             BankAccount.business_id == business_id
         ).first()
     
+    def _get_for_update(self, account_id: int, business_id: int) -> Optional[BankAccount]:
+        """Load just the columns balance changes need, locking the row"""
+        return self.db.query(BankAccount).options(
+            load_only(
+                BankAccount.id,
+                BankAccount.current_balance,
+                BankAccount.chart_of_account_id,
+                BankAccount.branch_id
+            )
+        ).filter(
+            BankAccount.id == account_id,
+            BankAccount.business_id == business_id
+        ).with_for_update().one_or_none()
+    
     def get_by_branch(self, branch_id: int, business_id: int) -> List[BankAccount]:
         return self.db.query(BankAccount).options(
             joinedload(BankAccount.chart_of_account)
@@ -53,28 +68,25 @@ class BankAccountService:
         self.db.flush()
         return account
     
-    def update_balance(self, account_id: int, amount: Decimal, is_debit: bool = True) -> Optional[BankAccount]:
-        """Update account balance"""
-        account = self.db.query(BankAccount).get(account_id)
-        if not account:
-            return None
-        
-        if is_debit:
-            account.current_balance += amount
-        else:
-            account.current_balance -= amount
-        
-        self.db.flush()
-        return account
+    def update_balance(self, account_id: int, amount: Decimal, is_debit: bool = True) -> Optional[Decimal]:
+        """Update account balance in place and return the new balance"""
+        delta = amount if is_debit else -amount
+        return self.db.execute(
+            update(BankAccount).where(
+                BankAccount.id == account_id
+            ).values(
+                current_balance=BankAccount.current_balance + delta
+            ).returning(BankAccount.current_balance)
+        ).scalar_one_or_none()
     
     def deposit(self, account_id: int, business_id: int, amount: Decimal, 
                description: str = None) -> BankAccount:
         """Make a deposit to bank account"""
-        account = self.get_by_id(account_id, business_id)
+        account = self._get_for_update(account_id, business_id)
         if not account:
             raise ValueError("Account not found")
         
-        account.current_balance += amount
+        self.update_balance(account.id, amount, is_debit=True)
         
         # Create ledger entry
         if account.chart_of_account_id:
@@ -88,20 +100,19 @@ class BankAccountService:
             )
             self.db.add(entry)
         
-        self.db.flush()
         return account
     
     def withdraw(self, account_id: int, business_id: int, amount: Decimal,
                 description: str = None) -> BankAccount:
         """Make a withdrawal from bank account"""
-        account = self.get_by_id(account_id, business_id)
+        account = self._get_for_update(account_id, business_id)
         if not account:
             raise ValueError("Account not found")
         
         if account.current_balance < amount:
             raise ValueError("Insufficient funds")
         
-        account.current_balance -= amount
+        self.update_balance(account.id, amount, is_debit=False)
         
         # Create ledger entry
         if account.chart_of_account_id:
@@ -115,13 +126,12 @@ class BankAccountService:
             )
             self.db.add(entry)
         
-        self.db.flush()
         return account
     
     def reconcile(self, account_id: int, business_id: int, statement_balance: Decimal,
                  reconciliation_date: date = None) -> Dict:
         """Perform bank reconciliation"""
-        account = self.get_by_id(account_id, business_id)
+        account = self._get_for_update(account_id, business_id)
         if not account:
             raise ValueError("Account not found")
         
@@ -130,8 +140,6 @@ class BankAccountService:
         account.last_reconciliation_date = reconciliation_date or date.today()
         account.last_reconciliation_balance = statement_balance
         
-        self.db.flush()
-        
         return {
             "account": account,
             "book_balance": account.current_balance,
@@ -146,10 +154,10 @@ class BankAccountService:
             return False
         
         # Check for transfers
-        has_transfers = self.db.query(FundTransfer).filter(
-            (FundTransfer.from_account_id == account_id) | 
-            (FundTransfer.to_account_id == account_id)
-        ).first()
+        has_transfers = self.db.query(exists().where(or_(
+            FundTransfer.from_account_id == account_id,
+            FundTransfer.to_account_id == account_id
+        ))).scalar()
         
         if has_transfers:
             return False
@@ -181,23 +189,39 @@ class FundTransferService:
         ).order_by(FundTransfer.transfer_date.desc()).all()
     
     def get_next_number(self, business_id: int) -> str:
-        last_transfer = self.db.query(FundTransfer).filter(
+        num = CounterService(self.db).next_value(
+            business_id, "FT", initial=lambda: self._get_last_number(business_id)
+        )
+        return f"FT-{num:05d}"
+    
+    def _get_last_number(self, business_id: int) -> int:
+        """Last issued transfer number, used once to seed the counter"""
+        last_transfer = self.db.query(FundTransfer.transfer_number).filter(
             FundTransfer.business_id == business_id
         ).order_by(FundTransfer.id.desc()).first()
         
         if last_transfer:
             try:
-                num = int(last_transfer.transfer_number.replace("FT-", ""))
-                return f"FT-{num + 1:05d}"
+                return int(last_transfer.transfer_number.replace("FT-", ""))
             except ValueError:
                 pass
         
-        return "FT-00001"
+        return 0
     
     def create(self, transfer_data: FundTransferCreate, branch_id: int, business_id: int) -> FundTransfer:
         """Create a fund transfer between accounts"""
-        from_account = self.db.query(BankAccount).get(transfer_data.from_account_id)
-        to_account = self.db.query(BankAccount).get(transfer_data.to_account_id)
+        # Load both accounts in a single round trip
+        accounts = {
+            account.id: account
+            for account in self.db.query(BankAccount).options(
+                joinedload(BankAccount.chart_of_account)
+            ).filter(
+                BankAccount.id.in_([transfer_data.from_account_id, transfer_data.to_account_id]),
+                BankAccount.business_id == business_id
+            ).all()
+        }
+        from_account = accounts.get(transfer_data.from_account_id)
+        to_account = accounts.get(transfer_data.to_account_id)
         
         if not from_account or not to_account:
             raise ValueError("One or both accounts not found")
@@ -220,47 +244,53 @@ class FundTransferService:
         self.db.add(transfer)
         
         # Update balances
-        from_account.current_balance -= transfer_data.amount
-        to_account.current_balance += transfer_data.amount
+        account_service = BankAccountService(self.db)
+        account_service.update_balance(from_account.id, transfer_data.amount, is_debit=False)
+        account_service.update_balance(to_account.id, transfer_data.amount, is_debit=True)
         
-        # Create ledger entries
+        # Create ledger entries in a single multi-row INSERT
+        entries = []
         if from_account.chart_of_account_id:
-            from_entry = LedgerEntry(
-                transaction_date=transfer_data.transfer_date,
-                description=f"Transfer to {to_account.account_name}",
-                debit=Decimal("0"),
-                credit=transfer_data.amount,
-                account_id=from_account.chart_of_account_id,
-                branch_id=branch_id
-            )
-            self.db.add(from_entry)
+            entries.append({
+                "transaction_date": transfer_data.transfer_date,
+                "description": f"Transfer to {to_account.account_name}",
+                "debit": Decimal("0"),
+                "credit": transfer_data.amount,
+                "account_id": from_account.chart_of_account_id,
+                "branch_id": branch_id
+            })
         
         if to_account.chart_of_account_id:
-            to_entry = LedgerEntry(
-                transaction_date=transfer_data.transfer_date,
-                description=f"Transfer from {from_account.account_name}",
-                debit=transfer_data.amount,
-                credit=Decimal("0"),
-                account_id=to_account.chart_of_account_id,
-                branch_id=branch_id
-            )
-            self.db.add(to_entry)
+            entries.append({
+                "transaction_date": transfer_data.transfer_date,
+                "description": f"Transfer from {from_account.account_name}",
+                "debit": transfer_data.amount,
+                "credit": Decimal("0"),
+                "account_id": to_account.chart_of_account_id,
+                "branch_id": branch_id
+            })
+        
+        if entries:
+            self.db.execute(insert(LedgerEntry), entries)
         
-        self.db.flush()
         return transfer
     
     def get_transfer_history(self, account_id: int, business_id: int, 
                             start_date: date = None, end_date: date = None) -> List[FundTransfer]:
         """Get transfer history for an account"""
-        query = self.db.query(FundTransfer).filter(
-            FundTransfer.business_id == business_id,
-            (FundTransfer.from_account_id == account_id) | 
-            (FundTransfer.to_account_id == account_id)
-        )
-        
-        if start_date:
-            query = query.filter(FundTransfer.transfer_date >= start_date)
-        if end_date:
-            query = query.filter(FundTransfer.transfer_date <= end_date)
+        # One indexed branch per FK column, combined with UNION ALL; an OR
+        # across the two columns generally cannot use either index
+        queries = []
+        for account_column in (FundTransfer.from_account_id, FundTransfer.to_account_id):
+            query = select(FundTransfer).where(
+                FundTransfer.business_id == business_id,
+                account_column == account_id
+            )
+            if start_date:
+                query = query.where(FundTransfer.transfer_date >= start_date)
+            if end_date:
+                query = query.where(FundTransfer.transfer_date <= end_date)
+            queries.append(query)
         
-        return query.order_by(FundTransfer.transfer_date.desc()).all()
+        transfers = aliased(FundTransfer, union_all(*queries).subquery())
+        return self.db.query(transfers).order_by(transfers.transfer_date.desc()).all()
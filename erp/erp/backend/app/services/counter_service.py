@@ -0,0 +1,60 @@
+"""
+Counter Service - Atomic per-business document numbering
+"""
+from typing import Callable, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import update
+from app.core.database import dialect_insert
+from app.models import Counter
+
+
+class CounterService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def next_value(self, business_id: int, kind: str,
+                   initial: Optional[Callable[[], int]] = None) -> int:
+        """Increment and return the counter for (business_id, kind).
+
+        The increment is a single UPDATE ... RETURNING, so concurrent callers
+        never receive the same value. When no counter row exists yet, it is
+        seeded from ``initial()`` (the last number already issued), or from
+        zero, with an INSERT that does nothing if a concurrent caller seeded
+        it first, and the increment is then retried.
+        """
+        value = self._increment(business_id, kind)
+
+        if value is None:
+            self.db.execute(
+                dialect_insert(self.db, Counter).values(
+                    business_id=business_id,
+                    kind=kind,
+                    last_value=initial() if initial else 0
+                ).on_conflict_do_nothing(index_elements=["business_id", "kind"])
+            )
+            value = self._increment(business_id, kind)
+
+        return value
+
+    def _increment(self, business_id: int, kind: str) -> Optional[int]:
+        return self.db.execute(
+            update(Counter).where(
+                Counter.business_id == business_id,
+                Counter.kind == kind
+            ).values(
+                last_value=Counter.last_value + 1
+            ).returning(Counter.last_value)
+        ).scalar_one_or_none()
+
+    def peek_value(self, business_id: int, kind: str,
+                   initial: Optional[Callable[[], int]] = None) -> int:
+        """Return the value next_value would issue, without consuming it"""
+        last_value = self.db.query(Counter.last_value).filter(
+            Counter.business_id == business_id,
+            Counter.kind == kind
+        ).scalar()
+
+        if last_value is None:
+            last_value = initial() if initial else 0
+
+        return last_value + 1
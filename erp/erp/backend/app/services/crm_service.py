@@ -125,6 +125,17 @@ class VendorService:
             query = query.filter(Vendor.is_active == True)
         return query.all()
     
+    def search(self, branch_id: int, business_id: int, term: str = "", limit: int = 20) -> List[Vendor]:
+        """Active vendors whose name contains ``term``, for form lookups"""
+        query = self.db.query(Vendor).filter(
+            Vendor.business_id == business_id,
+            Vendor.branch_id == branch_id,
+            Vendor.is_active == True
+        )
+        if term:
+            query = query.filter(Vendor.name.ilike(f"%{term}%"))
+        return query.order_by(Vendor.name).limit(limit).all()
+    
     def get_all_by_business(self, business_id: int) -> List[Vendor]:
         return self.db.query(Vendor).filter(Vendor.business_id == business_id).all()
     
@@ -2,15 +2,28 @@
 Dashboard Service - Analytics and Reporting
 """
 from typing import Dict, List
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, select, cast, literal, text, Date
 from decimal import Decimal
 from datetime import date, timedelta
+from app.core.database import SessionLocal
 from app.models import (
     SalesInvoice, PurchaseBill, Expense, Customer, Vendor, Product,
-    LedgerEntry, Account, AccountType
+    LedgerEntry, Account, AccountType, DailySalesRollup
 )
 
+# Full dashboard payloads keyed by (business_id, branch_id). Polling clients
+# within the TTL share one computation; entries simply expire.
+_dashboard_cache = TTLCache(maxsize=1024, ttl=30)
+_dashboard_cache_lock = Lock()
+
+# Runs the independent dashboard sub-reports side by side, each on its own
+# pooled connection
+_dashboard_executor = ThreadPoolExecutor(max_workers=5, thread_name_prefix="dashboard")
+
 
 class DashboardService:
     def __init__(self, db: Session):
@@ -44,17 +57,17 @@ class DashboardService:
         ).scalar() or Decimal("0")
         
         # Total Receivables
-        receivables_result = self.db.query(func.sum(SalesInvoice.total_amount - SalesInvoice.paid_amount)).filter(
+        receivables_result = self.db.query(func.sum(SalesInvoice.outstanding)).filter(
             SalesInvoice.business_id == business_id,
             SalesInvoice.branch_id == branch_id,
-            SalesInvoice.status.in_(["Unpaid", "Partial", "Overdue"])
+            SalesInvoice.is_open.is_(True)
         ).scalar() or Decimal("0")
         
         # Total Payables
-        payables_result = self.db.query(func.sum(PurchaseBill.total_amount - PurchaseBill.paid_amount)).filter(
+        payables_result = self.db.query(func.sum(PurchaseBill.outstanding)).filter(
             PurchaseBill.business_id == business_id,
             PurchaseBill.branch_id == branch_id,
-            PurchaseBill.status.in_(["Unpaid", "Partial", "Overdue"])
+            PurchaseBill.is_open.is_(True)
         ).scalar() or Decimal("0")
         
         # Cash Balance
@@ -69,30 +82,29 @@ class DashboardService:
             balance = self._get_account_balance(account.id)
             cash_balance += balance
         
-        # Counts
-        total_customers = self.db.query(Customer).filter(
-            Customer.business_id == business_id,
-            Customer.branch_id == branch_id,
-            Customer.is_active == True
-        ).count()
-        
-        total_vendors = self.db.query(Vendor).filter(
-            Vendor.business_id == business_id,
-            Vendor.branch_id == branch_id,
-            Vendor.is_active == True
-        ).count()
-        
-        total_products = self.db.query(Product).filter(
-            Product.branch_id == branch_id,
-            Product.is_active == True
-        ).count()
-        
-        # Low stock products
-        low_stock = self.db.query(Product).filter(
-            Product.branch_id == branch_id,
-            Product.is_active == True,
-            Product.stock_quantity <= Product.reorder_level
-        ).count()
+        # Counts, fetched together as scalar subqueries in one round trip
+        counts = self.db.execute(select(
+            select(func.count()).select_from(Customer).where(
+                Customer.business_id == business_id,
+                Customer.branch_id == branch_id,
+                Customer.is_active == True
+            ).scalar_subquery().label("customers"),
+            select(func.count()).select_from(Vendor).where(
+                Vendor.business_id == business_id,
+                Vendor.branch_id == branch_id,
+                Vendor.is_active == True
+            ).scalar_subquery().label("vendors"),
+            select(func.count()).select_from(Product).where(
+                Product.branch_id == branch_id,
+                Product.is_active == True
+            ).scalar_subquery().label("products"),
+            # Low stock products
+            select(func.count()).select_from(Product).where(
+                Product.branch_id == branch_id,
+                Product.is_active == True,
+                Product.stock_quantity <= Product.reorder_level
+            ).scalar_subquery().label("low_stock")
+        )).one()
         
         return {
             "total_sales": sales_result,
@@ -101,10 +113,10 @@ class DashboardService:
             "total_receivables": receivables_result,
             "total_payables": payables_result,
             "cash_balance": cash_balance,
-            "total_customers": total_customers,
-            "total_vendors": total_vendors,
-            "total_products": total_products,
-            "low_stock_products": low_stock
+            "total_customers": counts.customers,
+            "total_vendors": counts.vendors,
+            "total_products": counts.products,
+            "low_stock_products": counts.low_stock
         }
     
     def _get_account_balance(self, account_id: int) -> Decimal:
@@ -115,135 +127,153 @@ class DashboardService:
         
         return result or Decimal("0")
     
+    def _date_series(self, start_date: date, end_date: date):
+        """One row per day from start_date to end_date, as a `day` column"""
+        if self.db.get_bind().dialect.name == "postgresql":
+            return select(
+                cast(func.generate_series(start_date, end_date, text("interval '1 day'")), Date).label("day")
+            ).subquery("days")
+        
+        # Portable fallback (SQLite): recursive CTE stepping one day at a time
+        days = select(literal(start_date, Date).label("day")).cte("days", recursive=True)
+        return days.union_all(
+            select(func.date(days.c.day, "+1 day")).where(days.c.day < end_date)
+        )
+    
     def get_sales_chart(self, business_id: int, branch_id: int, days: int = 30) -> Dict:
         """Get sales data for chart"""
         end_date = date.today()
         start_date = end_date - timedelta(days=days)
+        series = self._date_series(start_date, end_date)
         
+        # Daily totals are pre-aggregated as invoices are created
         results = self.db.query(
-            SalesInvoice.invoice_date,
-            func.sum(SalesInvoice.total_amount)
-        ).filter(
-            SalesInvoice.business_id == business_id,
-            SalesInvoice.branch_id == branch_id,
-            SalesInvoice.invoice_date >= start_date
-        ).group_by(SalesInvoice.invoice_date).all()
-        
-        # Fill in missing dates
-        date_dict = {r[0]: r[1] for r in results}
-        labels = []
-        values = []
-        
-        current_date = start_date
-        while current_date <= end_date:
-            labels.append(current_date.strftime("%Y-%m-%d"))
-            values.append(date_dict.get(current_date, Decimal("0")))
-            current_date += timedelta(days=1)
+            series.c.day,
+            func.coalesce(DailySalesRollup.total, 0)
+        ).select_from(series).outerjoin(
+            DailySalesRollup,
+            and_(
+                DailySalesRollup.day == series.c.day,
+                DailySalesRollup.business_id == business_id,
+                DailySalesRollup.branch_id == branch_id
+            )
+        ).order_by(series.c.day).all()
         
-        return {"labels": labels, "values": values}
+        return {
+            "labels": [day.strftime("%Y-%m-%d") for day, _ in results],
+            "values": [total for _, total in results]
+        }
     
     def get_expense_chart(self, business_id: int, branch_id: int, days: int = 30) -> Dict:
         """Get expense data for chart"""
         end_date = date.today()
         start_date = end_date - timedelta(days=days)
+        series = self._date_series(start_date, end_date)
         
         results = self.db.query(
-            Expense.expense_date,
-            func.sum(Expense.amount)
-        ).filter(
-            Expense.business_id == business_id,
-            Expense.branch_id == branch_id,
-            Expense.expense_date >= start_date
-        ).group_by(Expense.expense_date).all()
-        
-        date_dict = {r[0]: r[1] for r in results}
-        labels = []
-        values = []
+            series.c.day,
+            func.coalesce(func.sum(Expense.amount), 0)
+        ).select_from(series).outerjoin(
+            Expense,
+            and_(
+                Expense.expense_date == series.c.day,
+                Expense.business_id == business_id,
+                Expense.branch_id == branch_id
+            )
+        ).group_by(series.c.day).order_by(series.c.day).all()
         
-        current_date = start_date
-        while current_date <= end_date:
-            labels.append(current_date.strftime("%Y-%m-%d"))
-            values.append(date_dict.get(current_date, Decimal("0")))
-            current_date += timedelta(days=1)
-        
-        return {"labels": labels, "values": values}
+        return {
+            "labels": [day.strftime("%Y-%m-%d") for day, _ in results],
+            "values": [total for _, total in results]
+        }
     
-    def get_receivables_aging(self, business_id: int, branch_id: int) -> Dict:
-        """Get accounts receivable aging report"""
+    def _age_outstanding(self, rows) -> Dict:
+        """Bucket (due_date, outstanding) rows by how overdue they are"""
         today = date.today()
+        # Bucket boundaries as dates, so each row is a plain date comparison
+        d30 = today - timedelta(days=30)
+        d60 = today - timedelta(days=60)
+        d90 = today - timedelta(days=90)
         
-        invoices = self.db.query(SalesInvoice).filter(
-            SalesInvoice.business_id == business_id,
-            SalesInvoice.branch_id == branch_id,
-            SalesInvoice.status.in_(["Unpaid", "Partial", "Overdue"])
-        ).all()
-        
-        aging = {
-            "current": Decimal("0"),
-            "1_30": Decimal("0"),
-            "31_60": Decimal("0"),
-            "61_90": Decimal("0"),
-            "over_90": Decimal("0")
-        }
+        current = days_1_30 = days_31_60 = days_61_90 = over_90 = Decimal("0")
         
-        for invoice in invoices:
-            days_overdue = (today - invoice.due_date).days if invoice.due_date else 0
-            outstanding = invoice.total_amount - invoice.paid_amount
-            
-            if days_overdue <= 0:
-                aging["current"] += outstanding
-            elif days_overdue <= 30:
-                aging["1_30"] += outstanding
-            elif days_overdue <= 60:
-                aging["31_60"] += outstanding
-            elif days_overdue <= 90:
-                aging["61_90"] += outstanding
+        for due_date, outstanding in rows:
+            if not outstanding:
+                continue
+            if due_date is None or due_date >= today:
+                current += outstanding
+            elif due_date >= d30:
+                days_1_30 += outstanding
+            elif due_date >= d60:
+                days_31_60 += outstanding
+            elif due_date >= d90:
+                days_61_90 += outstanding
             else:
-                aging["over_90"] += outstanding
+                over_90 += outstanding
         
-        return aging
+        return {
+            "current": current,
+            "1_30": days_1_30,
+            "31_60": days_31_60,
+            "61_90": days_61_90,
+            "over_90": over_90
+        }
+    
+    def get_receivables_aging(self, business_id: int, branch_id: int) -> Dict:
+        """Get accounts receivable aging report"""
+        # Plain column rows, streamed in batches rather than buffered
+        invoices = self.db.execute(
+            select(SalesInvoice.due_date, SalesInvoice.outstanding).where(
+                SalesInvoice.business_id == business_id,
+                SalesInvoice.branch_id == branch_id,
+                SalesInvoice.is_open.is_(True)
+            ).execution_options(stream_results=True, yield_per=2000)
+        )
+        return self._age_outstanding(invoices)
     
     def get_payables_aging(self, business_id: int, branch_id: int) -> Dict:
         """Get accounts payable aging report"""
-        today = date.today()
-        
-        bills = self.db.query(PurchaseBill).filter(
-            PurchaseBill.business_id == business_id,
-            PurchaseBill.branch_id == branch_id,
-            PurchaseBill.status.in_(["Unpaid", "Partial", "Overdue"])
-        ).all()
+        # Plain column rows, streamed in batches rather than buffered
+        bills = self.db.execute(
+            select(PurchaseBill.due_date, PurchaseBill.outstanding).where(
+                PurchaseBill.business_id == business_id,
+                PurchaseBill.branch_id == branch_id,
+                PurchaseBill.is_open.is_(True)
+            ).execution_options(stream_results=True, yield_per=2000)
+        )
+        return self._age_outstanding(bills)
+    
+    def get_full_dashboard(self, business_id: int, branch_id: int) -> Dict:
+        """Get all dashboard data (cached for a short TTL)"""
+        key = (business_id, branch_id)
+        with _dashboard_cache_lock:
+            cached = _dashboard_cache.get(key)
+        if cached is not None:
+            return cached
         
-        aging = {
-            "current": Decimal("0"),
-            "1_30": Decimal("0"),
-            "31_60": Decimal("0"),
-            "61_90": Decimal("0"),
-            "over_90": Decimal("0")
+        futures = {
+            name: _dashboard_executor.submit(
+                self._run_in_session, method, business_id, branch_id
+            )
+            for name, method in (
+                ("stats", "get_stats"),
+                ("sales_chart", "get_sales_chart"),
+                ("expense_chart", "get_expense_chart"),
+                ("receivables_aging", "get_receivables_aging"),
+                ("payables_aging", "get_payables_aging")
+            )
         }
+        dashboard = {name: future.result() for name, future in futures.items()}
         
-        for bill in bills:
-            days_overdue = (today - bill.due_date).days if bill.due_date else 0
-            outstanding = bill.total_amount - bill.paid_amount
-            
-            if days_overdue <= 0:
-                aging["current"] += outstanding
-            elif days_overdue <= 30:
-                aging["1_30"] += outstanding
-            elif days_overdue <= 60:
-                aging["31_60"] += outstanding
-            elif days_overdue <= 90:
-                aging["61_90"] += outstanding
-            else:
-                aging["over_90"] += outstanding
-        
-        return aging
+        with _dashboard_cache_lock:
+            _dashboard_cache[key] = dashboard
+        return dashboard
     
-    def get_full_dashboard(self, business_id: int, branch_id: int) -> Dict:
-        """Get all dashboard data"""
-        return {
-            "stats": self.get_stats(business_id, branch_id),
-            "sales_chart": self.get_sales_chart(business_id, branch_id),
-            "expense_chart": self.get_expense_chart(business_id, branch_id),
-            "receivables_aging": self.get_receivables_aging(business_id, branch_id),
-            "payables_aging": self.get_payables_aging(business_id, branch_id)
-        }
+    @staticmethod
+    def _run_in_session(method: str, business_id: int, branch_id: int) -> Dict:
+        """Run one dashboard sub-report on its own pooled session"""
+        db = SessionLocal()
+        try:
+            return getattr(DashboardService(db), method)(business_id, branch_id)
+        finally:
+            db.close()
@@ -3,6 +3,7 @@ Inventory Service - Products, Categories, Stock Management
 """
 from typing import Optional, List
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import or_
 from decimal import Decimal
 from datetime import date
 from app.models import Product, Category, StockAdjustment
@@ -83,6 +84,17 @@ class ProductService:
             query = query.filter(Product.is_active == True)
         return query.all()
     
+    def search(self, branch_id: int, term: str = "", limit: int = 20) -> List[Product]:
+        """Active products whose name or SKU contains ``term``, for form lookups"""
+        query = self.db.query(Product).filter(
+            Product.branch_id == branch_id,
+            Product.is_active == True
+        )
+        if term:
+            pattern = f"%{term}%"
+            query = query.filter(or_(Product.name.ilike(pattern), Product.sku.ilike(pattern)))
+        return query.order_by(Product.name).limit(limit).all()
+    
     def get_low_stock(self, branch_id: int) -> List[Product]:
         """Get products below reorder level"""
         return self.db.query(Product).filter(
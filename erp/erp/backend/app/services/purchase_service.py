@@ -25,6 +25,13 @@ class PurchaseService:
             query = query.filter(PurchaseBill.branch_id == branch_id)
         return query.first()
     
+    def _get_for_update(self, bill_id: int, business_id: int) -> Optional[PurchaseBill]:
+        """Bill row alone, locked, for changes that only touch its own columns"""
+        return self.db.query(PurchaseBill).filter(
+            PurchaseBill.id == bill_id,
+            PurchaseBill.business_id == business_id
+        ).with_for_update().first()
+    
     def get_by_branch(self, branch_id: int, business_id: int, status: str = None) -> List[PurchaseBill]:
         query = self.db.query(PurchaseBill).options(
             joinedload(PurchaseBill.vendor)
@@ -68,6 +75,7 @@ class PurchaseService:
             total_amount=total_amount,
             paid_amount=Decimal("0"),
             status="Unpaid",
+            is_open=True,
             branch_id=branch_id,
             business_id=business_id
         )
@@ -159,7 +167,7 @@ class PurchaseService:
                 self.db.add(vat_entry)
     
     def record_payment(self, bill_id: int, payment_data: dict, business_id: int) -> PurchaseBill:
-        bill = self.get_by_id(bill_id, business_id)
+        bill = self._get_for_update(bill_id, business_id)
         if not bill:
             raise ValueError("Bill not found")
         
@@ -171,6 +179,7 @@ class PurchaseService:
         bill.paid_amount += amount
         if bill.paid_amount >= bill.total_amount:
             bill.status = "Paid"
+            bill.is_open = False
         elif bill.paid_amount > 0:
             bill.status = "Partial"
         
@@ -1,21 +1,57 @@
 """
 Sales Service - Invoices, Credit Notes, Payments
 """
-from typing import Optional, List
-from sqlalchemy.orm import Session, joinedload
+from typing import Optional, List, Dict, Tuple
+from sqlalchemy.orm import Session, joinedload, selectinload, raiseload
+from sqlalchemy import case, func, insert, select, update
 from decimal import Decimal
 from datetime import date
-from app.models import SalesInvoice, SalesInvoiceItem, CreditNote, CreditNoteItem, LedgerEntry, Account, Product
-from app.schemas import SalesInvoiceCreate, SalesInvoiceUpdate
+from app.models import (
+    SalesInvoice, SalesInvoiceItem, CreditNote, CreditNoteItem, LedgerEntry, Account, Product,
+    DailySalesRollup
+)
+from app.core.config import settings
+from app.core.database import dialect_insert
+from app.schemas import SalesInvoiceCreate, SalesInvoiceUpdate, SalesInvoiceItemCreate
+from app.services.counter_service import CounterService
+
+
+_ZERO = Decimal("0")
+_HUNDRED = Decimal("100")
+
+
+def _list_options(*options):
+    """Loader options for list queries; in DEBUG any other relationship
+    access raises instead of lazy-loading once per row"""
+    if settings.DEBUG:
+        return (*options, raiseload('*'))
+    return options
 
 
 class SalesService:
     def __init__(self, db: Session):
         self.db = db
+        self._account_cache: Dict[Tuple[int, str], Account] = {}
+    
+    def _get_accounts(self, business_id: int, names: List[str]) -> Dict[str, Account]:
+        """Look up system accounts by name, querying only those not yet cached"""
+        missing = [name for name in names if (business_id, name) not in self._account_cache]
+        if missing:
+            for account in self.db.query(Account).filter(
+                Account.business_id == business_id,
+                Account.name.in_(missing)
+            ).all():
+                self._account_cache.setdefault((business_id, account.name), account)
+        
+        return {
+            name: self._account_cache[(business_id, name)]
+            for name in names
+            if (business_id, name) in self._account_cache
+        }
     
     def get_by_id(self, invoice_id: int, business_id: int, branch_id: int = None) -> Optional[SalesInvoice]:
         query = self.db.query(SalesInvoice).options(
-            joinedload(SalesInvoice.items).joinedload(SalesInvoiceItem.product),
+            selectinload(SalesInvoice.items).joinedload(SalesInvoiceItem.product),
             joinedload(SalesInvoice.customer)
         ).filter(
             SalesInvoice.id == invoice_id,
@@ -27,7 +63,7 @@ class SalesService:
     
     def get_by_branch(self, branch_id: int, business_id: int, status: str = None) -> List[SalesInvoice]:
         query = self.db.query(SalesInvoice).options(
-            joinedload(SalesInvoice.customer)
+            *_list_options(joinedload(SalesInvoice.customer))
         ).filter(
             SalesInvoice.branch_id == branch_id,
             SalesInvoice.business_id == business_id
@@ -37,24 +73,40 @@ class SalesService:
         return query.order_by(SalesInvoice.created_at.desc()).all()
     
     def get_next_number(self, business_id: int) -> str:
-        """Generate next invoice number"""
-        last_invoice = self.db.query(SalesInvoice).filter(
+        """Allocate the next invoice number"""
+        num = CounterService(self.db).next_value(
+            business_id, "INV", initial=lambda: self._get_last_number(business_id)
+        )
+        return f"INV-{num:05d}"
+    
+    def preview_next_number(self, business_id: int) -> str:
+        """Next invoice number, for display only; nothing is allocated"""
+        num = CounterService(self.db).peek_value(
+            business_id, "INV", initial=lambda: self._get_last_number(business_id)
+        )
+        return f"INV-{num:05d}"
+    
+    def _get_last_number(self, business_id: int) -> int:
+        """Last issued invoice number, used once to seed the counter"""
+        last_id = select(func.max(SalesInvoice.id)).where(
             SalesInvoice.business_id == business_id
-        ).order_by(SalesInvoice.id.desc()).first()
+        ).scalar_subquery()
+        last_number = self.db.query(SalesInvoice.invoice_number).filter(
+            SalesInvoice.id == last_id
+        ).scalar()
         
-        if last_invoice:
+        if last_number:
             try:
-                num = int(last_invoice.invoice_number.replace("INV-", ""))
-                return f"INV-{num + 1:05d}"
+                return int(last_number.replace("INV-", ""))
             except ValueError:
                 pass
         
-        return "INV-00001"
+        return 0
     
-    def calculate_totals(self, items: List[dict], vat_rate: Decimal = Decimal("0")) -> dict:
-        """Calculate invoice totals"""
-        sub_total = sum(item["quantity"] * item["price"] for item in items)
-        vat_amount = sub_total * (vat_rate / 100) if vat_rate else Decimal("0")
+    def calculate_totals(self, items: List[SalesInvoiceItemCreate], vat_rate: Decimal = _ZERO) -> dict:
+        """Calculate invoice totals from the submitted line items"""
+        sub_total = sum((item.quantity * item.price for item in items), _ZERO)
+        vat_amount = sub_total * (vat_rate / _HUNDRED) if vat_rate else _ZERO
         total = sub_total + vat_amount
         return {
             "sub_total": sub_total,
@@ -62,10 +114,9 @@ class SalesService:
             "total_amount": total
         }
     
-    def create(self, invoice_data: SalesInvoiceCreate, business_id: int, branch_id: int, vat_rate: Decimal = Decimal("0")) -> SalesInvoice:
+    def create(self, invoice_data: SalesInvoiceCreate, business_id: int, branch_id: int, vat_rate: Decimal = _ZERO) -> SalesInvoice:
         # Calculate totals
-        items_data = [{"quantity": item.quantity, "price": item.price} for item in invoice_data.items]
-        totals = self.calculate_totals(items_data, vat_rate)
+        totals = self.calculate_totals(invoice_data.items, vat_rate)
         
         # Create invoice
         invoice = SalesInvoice(
@@ -77,202 +128,222 @@ class SalesService:
             sub_total=totals["sub_total"],
             vat_amount=totals["vat_amount"],
             total_amount=totals["total_amount"],
-            paid_amount=Decimal("0"),
+            paid_amount=_ZERO,
             status="Unpaid",
+            is_open=True,
             branch_id=branch_id,
             business_id=business_id
         )
         self.db.add(invoice)
         self.db.flush()
         
-        # Create items
+        # Create items in a single executemany INSERT
+        item_rows = []
+        qty_by_product = {}
         for item_data in invoice_data.items:
-            item = SalesInvoiceItem(
-                sales_invoice_id=invoice.id,
-                product_id=item_data.product_id,
-                quantity=item_data.quantity,
-                price=item_data.price,
-                returned_quantity=Decimal("0")
+            item_rows.append({
+                "sales_invoice_id": invoice.id,
+                "product_id": item_data.product_id,
+                "quantity": item_data.quantity,
+                "price": item_data.price,
+                "returned_quantity": _ZERO
+            })
+            qty_by_product[item_data.product_id] = (
+                qty_by_product.get(item_data.product_id, _ZERO) + item_data.quantity
             )
-            self.db.add(item)
-            
-            # Update product stock
-            product = self.db.query(Product).get(item_data.product_id)
-            if product:
-                product.stock_quantity -= item_data.quantity
+        self.db.execute(insert(SalesInvoiceItem), item_rows)
+        
+        # Update product stock, loading every referenced product in one query
+        products = self.db.query(Product).filter(
+            Product.id.in_(qty_by_product)
+        ).with_for_update().all()
+        for product in products:
+            product.stock_quantity -= qty_by_product[product.id]
         
         # Create ledger entries
         self._create_ledger_entries(invoice)
         
-        self.db.flush()
+        # Keep the dashboard's daily sales totals current
+        self._add_to_daily_rollup(invoice)
+        
         return invoice
     
+    def _add_to_daily_rollup(self, invoice: SalesInvoice):
+        """Add the invoice total to its day's DailySalesRollup row"""
+        stmt = dialect_insert(self.db, DailySalesRollup).values(
+            day=invoice.invoice_date,
+            total=invoice.total_amount,
+            branch_id=invoice.branch_id,
+            business_id=invoice.business_id
+        )
+        self.db.execute(stmt.on_conflict_do_update(
+            index_elements=["business_id", "branch_id", "day"],
+            set_={"total": DailySalesRollup.total + stmt.excluded.total}
+        ))
+    
     def _create_ledger_entries(self, invoice: SalesInvoice):
         """Create double-entry ledger entries for invoice"""
         # Get accounts
-        receivable_account = self.db.query(Account).filter(
-            Account.business_id == invoice.business_id,
-            Account.name == "Accounts Receivable"
-        ).first()
-        
-        sales_account = self.db.query(Account).filter(
-            Account.business_id == invoice.business_id,
-            Account.name == "Sales Revenue"
-        ).first()
+        accounts = self._get_accounts(
+            invoice.business_id, ["Accounts Receivable", "Sales Revenue", "VAT Payable"]
+        )
+        receivable_account = accounts.get("Accounts Receivable")
+        sales_account = accounts.get("Sales Revenue")
         
         if not receivable_account or not sales_account:
             return
         
-        # Debit Accounts Receivable
-        debit_entry = LedgerEntry(
-            transaction_date=invoice.invoice_date,
-            description=f"Invoice {invoice.invoice_number}",
-            debit=invoice.total_amount,
-            credit=Decimal("0"),
-            account_id=receivable_account.id,
-            customer_id=invoice.customer_id,
-            sales_invoice_id=invoice.id,
-            branch_id=invoice.branch_id
-        )
-        self.db.add(debit_entry)
-        
-        # Credit Sales Revenue
-        credit_entry = LedgerEntry(
-            transaction_date=invoice.invoice_date,
-            description=f"Invoice {invoice.invoice_number}",
-            debit=Decimal("0"),
-            credit=invoice.sub_total,
-            account_id=sales_account.id,
-            customer_id=invoice.customer_id,
-            sales_invoice_id=invoice.id,
-            branch_id=invoice.branch_id
-        )
-        self.db.add(credit_entry)
+        entries = [
+            # Debit Accounts Receivable
+            {
+                "transaction_date": invoice.invoice_date,
+                "description": f"Invoice {invoice.invoice_number}",
+                "debit": invoice.total_amount,
+                "credit": _ZERO,
+                "account_id": receivable_account.id,
+                "customer_id": invoice.customer_id,
+                "sales_invoice_id": invoice.id,
+                "branch_id": invoice.branch_id
+            },
+            # Credit Sales Revenue
+            {
+                "transaction_date": invoice.invoice_date,
+                "description": f"Invoice {invoice.invoice_number}",
+                "debit": _ZERO,
+                "credit": invoice.sub_total,
+                "account_id": sales_account.id,
+                "customer_id": invoice.customer_id,
+                "sales_invoice_id": invoice.id,
+                "branch_id": invoice.branch_id
+            }
+        ]
         
         # Credit VAT Payable if applicable
         if invoice.vat_amount > 0:
-            vat_account = self.db.query(Account).filter(
-                Account.business_id == invoice.business_id,
-                Account.name == "VAT Payable"
-            ).first()
+            vat_account = accounts.get("VAT Payable")
             
             if vat_account:
-                vat_entry = LedgerEntry(
-                    transaction_date=invoice.invoice_date,
-                    description=f"VAT for Invoice {invoice.invoice_number}",
-                    debit=Decimal("0"),
-                    credit=invoice.vat_amount,
-                    account_id=vat_account.id,
-                    customer_id=invoice.customer_id,
-                    sales_invoice_id=invoice.id,
-                    branch_id=invoice.branch_id
-                )
-                self.db.add(vat_entry)
+                entries.append({
+                    "transaction_date": invoice.invoice_date,
+                    "description": f"VAT for Invoice {invoice.invoice_number}",
+                    "debit": _ZERO,
+                    "credit": invoice.vat_amount,
+                    "account_id": vat_account.id,
+                    "customer_id": invoice.customer_id,
+                    "sales_invoice_id": invoice.id,
+                    "branch_id": invoice.branch_id
+                })
+        
+        self.db.execute(insert(LedgerEntry), entries)
     
     def record_payment(self, invoice_id: int, payment_data: dict, business_id: int) -> SalesInvoice:
-        invoice = self.get_by_id(invoice_id, business_id)
-        if not invoice:
-            raise ValueError("Invoice not found")
-        
         amount = payment_data["amount"]
         payment_account_id = payment_data["payment_account_id"]
         payment_date = payment_data["payment_date"]
         
-        # Update invoice
-        invoice.paid_amount += amount
-        if invoice.paid_amount >= invoice.total_amount:
-            invoice.status = "Paid"
-        elif invoice.paid_amount > 0:
-            invoice.status = "Partial"
+        # Update invoice in place and get it back in the same statement
+        paid_amount = SalesInvoice.paid_amount + amount
+        is_paid = paid_amount >= SalesInvoice.total_amount
+        invoice = self.db.execute(
+            update(SalesInvoice).where(
+                SalesInvoice.id == invoice_id,
+                SalesInvoice.business_id == business_id
+            ).values(
+                paid_amount=paid_amount,
+                status=case((is_paid, "Paid"), (paid_amount > 0, "Partial"), else_=SalesInvoice.status),
+                is_open=case((is_paid, False), else_=SalesInvoice.is_open)
+            ).returning(SalesInvoice).execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+        if not invoice:
+            raise ValueError("Invoice not found")
+        # The instance may already be in the session with its old values, and
+        # the computed outstanding column changed too, so reload the row
+        self.db.refresh(invoice)
         
         # Get accounts
-        cash_account = self.db.query(Account).get(payment_account_id)
-        receivable_account = self.db.query(Account).filter(
-            Account.business_id == business_id,
-            Account.name == "Accounts Receivable"
-        ).first()
+        cash_account = self.db.get(Account, payment_account_id)
+        receivable_account = self._get_accounts(business_id, ["Accounts Receivable"]).get("Accounts Receivable")
         
         if cash_account and receivable_account:
-            # Debit Cash/Bank
-            debit_entry = LedgerEntry(
-                transaction_date=payment_date,
-                description=f"Payment for Invoice {invoice.invoice_number}",
-                debit=amount,
-                credit=Decimal("0"),
-                account_id=cash_account.id,
-                customer_id=invoice.customer_id,
-                sales_invoice_id=invoice.id,
-                branch_id=invoice.branch_id
-            )
-            self.db.add(debit_entry)
-            
-            # Credit Accounts Receivable
-            credit_entry = LedgerEntry(
-                transaction_date=payment_date,
-                description=f"Payment for Invoice {invoice.invoice_number}",
-                debit=Decimal("0"),
-                credit=amount,
-                account_id=receivable_account.id,
-                customer_id=invoice.customer_id,
-                sales_invoice_id=invoice.id,
-                branch_id=invoice.branch_id
-            )
-            self.db.add(credit_entry)
+            self.db.execute(insert(LedgerEntry), [
+                # Debit Cash/Bank
+                {
+                    "transaction_date": payment_date,
+                    "description": f"Payment for Invoice {invoice.invoice_number}",
+                    "debit": amount,
+                    "credit": _ZERO,
+                    "account_id": cash_account.id,
+                    "customer_id": invoice.customer_id,
+                    "sales_invoice_id": invoice.id,
+                    "branch_id": invoice.branch_id
+                },
+                # Credit Accounts Receivable
+                {
+                    "transaction_date": payment_date,
+                    "description": f"Payment for Invoice {invoice.invoice_number}",
+                    "debit": _ZERO,
+                    "credit": amount,
+                    "account_id": receivable_account.id,
+                    "customer_id": invoice.customer_id,
+                    "sales_invoice_id": invoice.id,
+                    "branch_id": invoice.branch_id
+                }
+            ])
         
-        self.db.flush()
         return invoice
     
     def write_off(self, invoice_id: int, business_id: int, write_off_date: date) -> SalesInvoice:
         """Write off an unpaid invoice as bad debt"""
-        invoice = self.get_by_id(invoice_id, business_id)
+        invoice = self.db.execute(
+            update(SalesInvoice).where(
+                SalesInvoice.id == invoice_id,
+                SalesInvoice.business_id == business_id,
+                SalesInvoice.total_amount > SalesInvoice.paid_amount
+            ).values(
+                status="Written Off",
+                is_open=False
+            ).returning(SalesInvoice).execution_options(synchronize_session="fetch")
+        ).scalar_one_or_none()
         if not invoice:
-            raise ValueError("Invoice not found")
+            found = self.db.query(SalesInvoice.id).filter(
+                SalesInvoice.id == invoice_id,
+                SalesInvoice.business_id == business_id
+            ).first()
+            raise ValueError("Invoice already paid in full" if found else "Invoice not found")
         
         remaining = invoice.total_amount - invoice.paid_amount
-        if remaining <= 0:
-            raise ValueError("Invoice already paid in full")
-        
-        invoice.status = "Written Off"
         
         # Get accounts
-        receivable_account = self.db.query(Account).filter(
-            Account.business_id == business_id,
-            Account.name == "Accounts Receivable"
-        ).first()
-        
-        bad_debt_account = self.db.query(Account).filter(
-            Account.business_id == business_id,
-            Account.name == "Operating Expenses"
-        ).first()
+        accounts = self._get_accounts(business_id, ["Accounts Receivable", "Operating Expenses"])
+        receivable_account = accounts.get("Accounts Receivable")
+        bad_debt_account = accounts.get("Operating Expenses")
         
         if receivable_account and bad_debt_account:
-            # Debit Bad Debt Expense
-            debit_entry = LedgerEntry(
-                transaction_date=write_off_date,
-                description=f"Bad debt write-off for Invoice {invoice.invoice_number}",
-                debit=remaining,
-                credit=Decimal("0"),
-                account_id=bad_debt_account.id,
-                customer_id=invoice.customer_id,
-                sales_invoice_id=invoice.id,
-                branch_id=invoice.branch_id
-            )
-            self.db.add(debit_entry)
-            
-            # Credit Accounts Receivable
-            credit_entry = LedgerEntry(
-                transaction_date=write_off_date,
-                description=f"Bad debt write-off for Invoice {invoice.invoice_number}",
-                debit=Decimal("0"),
-                credit=remaining,
-                account_id=receivable_account.id,
-                customer_id=invoice.customer_id,
-                sales_invoice_id=invoice.id,
-                branch_id=invoice.branch_id
-            )
-            self.db.add(credit_entry)
+            self.db.execute(insert(LedgerEntry), [
+                # Debit Bad Debt Expense
+                {
+                    "transaction_date": write_off_date,
+                    "description": f"Bad debt write-off for Invoice {invoice.invoice_number}",
+                    "debit": remaining,
+                    "credit": _ZERO,
+                    "account_id": bad_debt_account.id,
+                    "customer_id": invoice.customer_id,
+                    "sales_invoice_id": invoice.id,
+                    "branch_id": invoice.branch_id
+                },
+                # Credit Accounts Receivable
+                {
+                    "transaction_date": write_off_date,
+                    "description": f"Bad debt write-off for Invoice {invoice.invoice_number}",
+                    "debit": _ZERO,
+                    "credit": remaining,
+                    "account_id": receivable_account.id,
+                    "customer_id": invoice.customer_id,
+                    "sales_invoice_id": invoice.id,
+                    "branch_id": invoice.branch_id
+                }
+            ])
         
-        self.db.flush()
         return invoice
 
 
@@ -282,7 +353,7 @@ class CreditNoteService:
     
     def get_by_id(self, credit_note_id: int, business_id: int, branch_id: int = None) -> Optional[CreditNote]:
         query = self.db.query(CreditNote).options(
-            joinedload(CreditNote.items).joinedload(CreditNoteItem.product),
+            selectinload(CreditNote.items).joinedload(CreditNoteItem.product),
             joinedload(CreditNote.customer)
         ).filter(
             CreditNote.id == credit_note_id,
@@ -294,29 +365,40 @@ class CreditNoteService:
     
     def get_by_branch(self, branch_id: int, business_id: int) -> List[CreditNote]:
         return self.db.query(CreditNote).options(
-            joinedload(CreditNote.customer)
+            *_list_options(joinedload(CreditNote.customer))
         ).filter(
             CreditNote.business_id == business_id,
             CreditNote.branch_id == branch_id
         ).order_by(CreditNote.created_at.desc()).all()
     
     def get_next_number(self, business_id: int) -> str:
-        last_cn = self.db.query(CreditNote).filter(
+        num = CounterService(self.db).next_value(
+            business_id, "CN", initial=lambda: self._get_last_number(business_id)
+        )
+        return f"CN-{num:05d}"
+    
+    def _get_last_number(self, business_id: int) -> int:
+        """Last issued credit note number, used once to seed the counter"""
+        last_id = select(func.max(CreditNote.id)).where(
             CreditNote.business_id == business_id
-        ).order_by(CreditNote.id.desc()).first()
+        ).scalar_subquery()
+        last_number = self.db.query(CreditNote.credit_note_number).filter(
+            CreditNote.id == last_id
+        ).scalar()
         
-        if last_cn:
+        if last_number:
             try:
-                num = int(last_cn.credit_note_number.replace("CN-", ""))
-                return f"CN-{num + 1:05d}"
+                return int(last_number.replace("CN-", ""))
             except ValueError:
                 pass
         
-        return "CN-00001"
+        return 0
     
     def create_for_invoice(self, original_invoice: SalesInvoice, items_to_return: List[dict], credit_note_date: date) -> CreditNote:
         """Create credit note for invoice return"""
-        total_amount = sum(item["quantity"] * item["price"] for item in items_to_return)
+        total_amount = sum(
+            (item["quantity"] * item["price"] for item in items_to_return), _ZERO
+        )
         
         credit_note = CreditNote(
             credit_note_number=self.get_next_number(original_invoice.business_id),
@@ -330,6 +412,20 @@ class CreditNoteService:
         self.db.add(credit_note)
         self.db.flush()
         
+        # Load the affected products and original invoice lines up front
+        products = {
+            product.id: product
+            for product in self.db.query(Product).filter(
+                Product.id.in_({item["product_id"] for item in items_to_return})
+            ).with_for_update().all()
+        }
+        orig_items = {
+            orig_item.id: orig_item
+            for orig_item in self.db.query(SalesInvoiceItem).filter(
+                SalesInvoiceItem.id.in_({item["original_item_id"] for item in items_to_return})
+            ).all()
+        }
+        
         for item_data in items_to_return:
             cn_item = CreditNoteItem(
                 credit_note_id=credit_note.id,
@@ -340,14 +436,13 @@ class CreditNoteService:
             self.db.add(cn_item)
             
             # Update product stock
-            product = self.db.query(Product).get(item_data["product_id"])
+            product = products.get(item_data["product_id"])
             if product:
                 product.stock_quantity += item_data["quantity"]
             
             # Update returned quantity on original item
-            orig_item = self.db.query(SalesInvoiceItem).get(item_data["original_item_id"])
+            orig_item = orig_items.get(item_data["original_item_id"])
             if orig_item:
                 orig_item.returned_quantity += item_data["quantity"]
         
-        self.db.flush()
         return credit_note
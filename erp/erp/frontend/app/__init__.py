@@ -2,26 +2,65 @@
 Flask Frontend Application
 """
 import os
+import hashlib
+import orjson
+from datetime import datetime
 import requests
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, g
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from concurrent.futures import ThreadPoolExecutor
+from jinja2 import TemplateNotFound
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, g, abort
+from flask.json.provider import DefaultJSONProvider
 from flask_wtf.csrf import CSRFProtect
+from flask_caching import Cache
 from functools import wraps
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, used by jsonify and the session cookie"""
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        if kwargs:
+            # orjson has no hooks; the session serializer needs object_hook
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
 # Initialize app
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['BACKEND_URL'] = os.getenv('BACKEND_URL', 'http://localhost:8000')
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 
+# Templates are compiled once and kept; set TEMPLATES_AUTO_RELOAD=true while editing them
+app.config['TEMPLATES_AUTO_RELOAD'] = os.getenv('TEMPLATES_AUTO_RELOAD', 'false').lower() == 'true'
+app.jinja_options = {**app.jinja_options, 'cache_size': 1000}
+
 # CSRF Protection - Configure for HTMX
 app.config['WTF_CSRF_HEADERS'] = ['X-CSRFToken', 'X-CSRF-Token']
 app.config['WTF_CSRF_TIME_LIMIT'] = None  # No time limit for CSRF tokens
 csrf = CSRFProtect(app)
 
+# In-process cache for slowly-changing backend reference data
+app.config['CACHE_TYPE'] = os.getenv('CACHE_TYPE', 'SimpleCache')
+app.config['CACHE_DEFAULT_TIMEOUT'] = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 60))
+cache = Cache(app)
+
 
 # ==================== HELPERS ====================
 
@@ -30,73 +69,235 @@ def get_backend_url(endpoint):
     return f"{app.config['BACKEND_URL']}/api/v1{endpoint}"
 
 
-def api_request(method, endpoint, data=None, params=None, include_auth=True):
-    """Make request to backend API"""
-    url = get_backend_url(endpoint)
-    headers = {'Content-Type': 'application/json'}
+# One pooled, keep-alive session for all backend traffic
+_backend_session = requests.Session()
+# Failed connects are retried (nothing reached the backend), and idempotent
+# calls also on gateway errors, returning the last 5xx rather than raising.
+# Read timeouts are never retried, so one call stays within _BACKEND_TIMEOUT
+# and a POST the backend may already have applied is not sent twice.
+_backend_adapter = HTTPAdapter(
+    pool_connections=50, pool_maxsize=50,
+    max_retries=Retry(
+        total=2, read=False, backoff_factor=0.1,
+        allowed_methods=frozenset(('GET', 'PUT', 'DELETE')),
+        status_forcelist=(502, 503, 504), raise_on_status=False
+    )
+)
+_backend_session.mount('http://', _backend_adapter)
+_backend_session.mount('https://', _backend_adapter)
+# The session is shared by every user, so never keep cookies the backend sets;
+# credentials are passed per request instead
+_backend_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+
+_BASE_HEADERS = {'Content-Type': 'application/json'}
+
+# (connect, read) seconds; a stalled backend must not hold a worker forever
+_BACKEND_TIMEOUT = (2.0, 10.0)
+_BACKEND_METHODS = frozenset(('GET', 'POST', 'PUT', 'DELETE'))
+_BODY_METHODS = frozenset(('POST', 'PUT'))
+
+
+def _auth_headers(include_auth=True):
+    """Build the headers and cookies carrying the session's credentials"""
+    token = session.get('access_token') if include_auth else None
+    if not token:
+        return _BASE_HEADERS, {}
     
-    # Build cookies dict
-    cookies = {}
-    if include_auth and 'access_token' in session:
-        headers['Authorization'] = f"Bearer {session['access_token']}"
-        cookies['access_token'] = session.get('access_token')
-        
-        # Include selected_branch_id cookie for branch switching (for admins)
-        if 'selected_branch_id' in session:
-            cookies['selected_branch_id'] = str(session['selected_branch_id'])
+    headers = {**_BASE_HEADERS, 'Authorization': f"Bearer {token}"}
+    cookies = {'access_token': token}
+    
+    # Include selected_branch_id cookie for branch switching (for admins)
+    branch_id = session.get('selected_branch_id')
+    if branch_id is not None:
+        cookies['selected_branch_id'] = str(branch_id)
+    
+    return headers, cookies
+
+
+def _dump_body(data):
+    """Encode a JSON request body; None means no body, as with requests' json="""
+    return orjson.dumps(data) if data is not None else None
+
+
+def _send_request(method, url, headers, cookies, data=None, params=None):
+    """Send one request to the backend; safe to call outside a request context"""
+    if method not in _BACKEND_METHODS:
+        return None, "Invalid method"
     
     try:
-        if method == 'GET':
-            response = requests.get(url, headers=headers, params=params, cookies=cookies)
-        elif method == 'POST':
-            response = requests.post(url, json=data, headers=headers, cookies=cookies)
-        elif method == 'PUT':
-            response = requests.put(url, json=data, headers=headers, cookies=cookies)
-        elif method == 'DELETE':
-            response = requests.delete(url, headers=headers, cookies=cookies)
-        else:
-            return None, "Invalid method"
-        
-        return response.json() if response.content else {}, response.status_code
+        response = _backend_session.request(
+            method, url, params=params, headers=headers, cookies=cookies, timeout=_BACKEND_TIMEOUT,
+            data=_dump_body(data) if method in _BODY_METHODS else None
+        )
+        return orjson.loads(response.content) if response.content else {}, response.status_code
+    except requests.exceptions.Timeout:
+        return None, "Backend timeout"
     except requests.exceptions.ConnectionError:
         return None, "Backend connection error"
     except Exception as e:
         return None, str(e)
 
 
+def api_request(method, endpoint, data=None, params=None, include_auth=True):
+    """Make request to backend API"""
+    headers, cookies = _auth_headers(include_auth)
+    return _send_request(method, get_backend_url(endpoint), headers, cookies, data, params)
+
+
+_api_executor = ThreadPoolExecutor(max_workers=8)
+
+
+def api_request_many(specs, include_auth=True):
+    """Make several independent backend requests concurrently.
+    
+    Each spec is a ``(method, endpoint[, data[, params]])`` tuple. Returns a
+    list of ``(data, status)`` results in the same order as ``specs``.
+    """
+    # The session is only available on the request thread, so read it here
+    headers, cookies = _auth_headers(include_auth)
+    futures = [
+        _api_executor.submit(_send_request, method, get_backend_url(endpoint), headers, cookies, *args)
+        for method, endpoint, *args in specs
+    ]
+    return [future.result() for future in futures]
+
+
+def _session_owner():
+    """Short, non-reversible id for the logged-in session's token"""
+    return hashlib.sha256(session.get('access_token', '').encode()).hexdigest()[:16]
+
+
+def _api_cache_key(endpoint, params=None):
+    """Cache key scoped to the logged-in session and selected branch"""
+    return f"api:{_session_owner()}:{session.get('selected_branch_id')}:{endpoint}:{sorted((params or {}).items())}"
+
+
+def cached_api_get(endpoint, params=None, timeout=None):
+    """GET from the backend, reusing a recent successful response if cached"""
+    key = _api_cache_key(endpoint, params)
+    data = cache.get(key)
+    if data is not None:
+        return data, 200
+    
+    data, status = api_request('GET', endpoint, params=params)
+    if status == 200:
+        cache.set(key, data, timeout=timeout)
+    return data, status
+
+
+def api_get_many(endpoints, cached=()):
+    """GET several endpoints concurrently, like api_request_many.
+    
+    Endpoints listed in ``cached`` are served from the cache used by
+    cached_api_get when present, and stored there after a successful fetch.
+    Returns ``(data, status)`` results in the same order as ``endpoints``.
+    """
+    results = [None] * len(endpoints)
+    keys = {}
+    for i, endpoint in enumerate(endpoints):
+        if endpoint in cached:
+            keys[i] = _api_cache_key(endpoint)
+            data = cache.get(keys[i])
+            if data is not None:
+                results[i] = (data, 200)
+    
+    missing = [i for i, result in enumerate(results) if result is None]
+    fetched = api_request_many([('GET', endpoints[i]) for i in missing])
+    for i, (data, status) in zip(missing, fetched):
+        results[i] = (data, status)
+        if status == 200 and i in keys:
+            cache.set(keys[i], data)
+    return results
+
+
+def invalidate_api_get(endpoint, params=None):
+    """Drop a cached GET response after the data behind it changes"""
+    cache.delete(_api_cache_key(endpoint, params))
+
+
 def login_required(f):
     """Decorator to require login"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'access_token' not in session:
-            return redirect(url_for('auth.login'))
+            return redirect(URLS['auth.login'])
         return f(*args, **kwargs)
     return decorated_function
 
 
+# Bit assigned to each permission in the session's permission mask, in the
+# backend's permission order. Sessions store the mask, so only ever append
+# new permissions; moving an existing name would change what old masks grant.
+PERMS = {name: 1 << bit for bit, name in enumerate((
+    'settings:edit',
+    'users:view', 'users:create', 'users:edit', 'users:delete', 'users:assign-roles',
+    'roles:view', 'roles:create', 'roles:edit', 'roles:delete',
+    'branches:view', 'branches:create', 'branches:edit', 'branches:delete',
+    'banking:view', 'banking:create', 'banking:edit', 'banking:delete',
+    'transfers:view', 'transfers:create',
+    'reconciliation:view', 'reconciliation:create',
+    'reports:view', 'reports:export',
+    'jarvis:ask',
+    'customers:view', 'customers:create', 'customers:edit', 'customers:delete',
+    'vendors:view', 'vendors:create', 'vendors:edit', 'vendors:delete',
+    'products:view', 'products:create', 'products:edit', 'products:delete',
+    'categories:view', 'categories:create', 'categories:edit', 'categories:delete',
+    'stock:view', 'stock:create',
+    'bills:view', 'bills:create', 'bills:edit', 'bills:delete',
+    'debit_notes:view', 'debit_notes:create',
+    'invoices:view', 'invoices:create', 'invoices:edit', 'invoices:delete',
+    'credit_notes:view', 'credit_notes:create',
+    'expenses:view', 'expenses:create', 'expenses:edit', 'expenses:delete',
+    'accounts:view', 'accounts:create', 'accounts:edit', 'accounts:delete',
+    'journal:view', 'journal:create', 'journal:edit', 'journal:delete',
+    'employees:view', 'employees:create', 'employees:edit', 'employees:delete',
+    'payroll:view', 'payroll:create',
+    'budgeting:view', 'budgeting:create', 'budgeting:edit', 'budgeting:delete',
+))}
+
+
+def permission_mask(permissions):
+    """Fold a list of permission names into a PERMS bitmask"""
+    mask = 0
+    for name in permissions:
+        mask |= PERMS.get(name, 0)
+    return mask
+
+
+def set_session_permissions(permissions):
+    """Store the user's permissions and their bitmask in the session"""
+    session['permissions'] = permissions
+    # Stored as hex: the mask is wider than the 64-bit ints orjson can encode
+    session['perm_mask'] = format(permission_mask(permissions), 'x')
+
+
+def _session_perm_mask():
+    """Permission bitmask for the current session"""
+    mask = session.get('perm_mask')
+    if not isinstance(mask, str):
+        # Session from before masks were stored as hex
+        mask = session['perm_mask'] = format(permission_mask(session.get('permissions') or []), 'x')
+    return int(mask, 16)
+
+
 def permission_required(*permissions):
     """Decorator to require specific permissions.
     User must have at least one of the specified permissions.
     Superusers bypass this check.
     """
+    # Resolved once here, so an unknown permission name fails at import time
+    required = permission_mask(permissions)
+    unknown = [perm for perm in permissions if perm not in PERMS]
+    if unknown:
+        raise KeyError(f"Unknown permissions: {', '.join(unknown)}")
+    
     def decorator(f):
         @wraps(f)
         @login_required
         def decorated_function(*args, **kwargs):
             # Superusers have all permissions
-            if session.get('is_superuser', False):
-                return f(*args, **kwargs)
-            
-            # Check if user has any of the required permissions
-            user_permissions = session.get('permissions', [])
-            if not user_permissions:
-                user_permissions = []
-            
-            # Check if user has at least one required permission
-            has_access = any(perm in user_permissions for perm in permissions)
-            
-            if not has_access:
-                from flask import abort
+            if not session.get('is_superuser', False) and not _session_perm_mask() & required:
                 abort(403)
             
             return f(*args, **kwargs)
@@ -104,30 +305,56 @@ def permission_required(*permissions):
     return decorator
 
 
+_MISSING = object()
+_USER_CACHE_TIMEOUT = 300
+
+
 def get_current_user():
-    """Get current user from session/API"""
+    """Get current user from session/API, memoized on g for the request"""
+    user = g.get('_current_user', _MISSING)
+    if user is not _MISSING:
+        return user
+    
+    g._current_user = user = _load_current_user()
+    return user
+
+
+def _load_current_user():
     if 'access_token' not in session:
         return None
     
-    # Cache user in session
-    if 'user_data' in session:
-        return session['user_data']
+    # Sessions from before the user moved server-side still carry it in the cookie
+    session.pop('user_data', None)
+    
+    user_data = cache.get(f"user:{_session_owner()}")
+    if user_data is not None:
+        return user_data
     
     user_data, status = api_request('GET', '/auth/me')
     if status == 200:
-        session['user_data'] = user_data
+        remember_current_user(user_data)
         return user_data
     return None
 
 
+def remember_current_user(user_data):
+    """Keep the /auth/me payload server-side, keyed by the session's token"""
+    cache.set(f"user:{_session_owner()}", user_data, timeout=_USER_CACHE_TIMEOUT)
+
+
+def forget_current_user():
+    """Drop the cached user for the session's token (on logout)"""
+    cache.delete(f"user:{_session_owner()}")
+
+
 @app.context_processor
 def inject_globals():
     """Inject global variables into templates"""
     return {
         'current_user': get_current_user(),
         'app_name': 'Booklet ERP',
-        'current_year': __import__('datetime').datetime.now().year,
-        'has_permission': lambda perm: perm in session.get('permissions', []) or session.get('is_superuser', False),
+        'current_year': datetime.now().year,
+        'has_permission': lambda perm: bool(PERMS.get(perm, 0) & _session_perm_mask()) or session.get('is_superuser', False),
         'debug_permissions': lambda: session.get('permissions', [])
     }
 
@@ -146,7 +373,7 @@ def date_filter(value, format='%Y-%m-%d'):
     """Format date"""
     try:
         if value:
-            return __import__('datetime').datetime.strptime(str(value), '%Y-%m-%d').strftime(format)
+            return datetime.strptime(str(value), '%Y-%m-%d').strftime(format)
     except ValueError:
         pass
     return value
@@ -154,23 +381,41 @@ def date_filter(value, format='%Y-%m-%d'):
 
 # ==================== ERROR HANDLERS ====================
 
+# Error pages rendered once at startup, for requests that carry no session
+_ERROR_PAGES = {}
+
+
+def _error_page(code):
+    """Render an error page, reusing the startup copy when there is no session.
+
+    The pages embed the session's CSRF token and flashed messages, so only
+    session-less hits (scanners, stray asset requests) can share one copy.
+    """
+    if session or code not in _ERROR_PAGES:
+        return render_template(f'shared/{code}.html'), code
+    return _ERROR_PAGES[code], code
+
+
 @app.errorhandler(404)
 def not_found(error):
-    return render_template('shared/404.html'), 404
+    return _error_page(404)
 
 
 @app.errorhandler(500)
 def server_error(error):
-    return render_template('shared/500.html'), 500
+    return _error_page(500)
 
 
 @app.errorhandler(403)
 def forbidden(error):
-    return render_template('shared/403.html'), 403
+    return _error_page(403)
 
 
 # ==================== REGISTER BLUEPRINTS ====================
 
+# Paths of the parameterless routes, filled in once the blueprints are registered
+URLS = {}
+
 from app.views import auth, dashboard, crm, inventory, sales, purchases, accounting, hr, banking, reports, settings
 
 app.register_blueprint(auth.bp)
@@ -185,6 +430,34 @@ app.register_blueprint(banking.bp)
 app.register_blueprint(reports.bp)
 app.register_blueprint(settings.bp)
 
+# Compile the small partials HTMX swaps in on every list action before the first request
+_HOT_TEMPLATES = (
+    'inventory/partials/category_row.html',
+    'inventory/partials/product_row.html',
+    'inventory/partials/product_row_edit.html',
+    'shared/partials/error_alert.html',
+    'auth/partials/login_error.html',
+)
+# ...along with every page of the sales and settings sections
+_WARM_TEMPLATE_DIRS = ('sales/', 'settings/')
+_warm_templates = app.jinja_env.list_templates(filter_func=lambda name: name.startswith(_WARM_TEMPLATE_DIRS))
+for _name in (*_HOT_TEMPLATES, *_warm_templates):
+    try:
+        app.jinja_env.get_template(_name)
+    except TemplateNotFound:
+        pass
+
+# Build the URL map now rather than on the first request, and resolve the
+# fixed redirect targets once instead of walking the map on every redirect;
+# the session-less error pages are rendered here too
+with app.test_request_context():
+    URLS.update(
+        (rule.endpoint, url_for(rule.endpoint))
+        for rule in app.url_map.iter_rules()
+        if not rule.arguments and 'GET' in rule.methods
+    )
+    _ERROR_PAGES.update((code, render_template(f'shared/{code}.html')) for code in (403, 404, 500))
+
 
 # ==================== MAIN ROUTES ====================
 
@@ -192,8 +465,8 @@ app.register_blueprint(settings.bp)
 def index():
     """Root route"""
     if 'access_token' in session:
-        return redirect(url_for('dashboard.index'))
-    return redirect(url_for('auth.login'))
+        return redirect(URLS['dashboard.index'])
+    return redirect(URLS['auth.login'])
 
 
 if __name__ == '__main__':
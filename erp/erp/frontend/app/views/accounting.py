@@ -1,9 +1,9 @@
 """
 Accounting Views
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from app import api_request, login_required, permission_required
-import json
+from flask import Blueprint, render_template, request, redirect, flash
+from app import api_request, cached_api_get, invalidate_api_get, login_required, permission_required, URLS
+import orjson
 
 bp = Blueprint('accounting', __name__, url_prefix='/accounting')
 
@@ -13,7 +13,7 @@ bp = Blueprint('accounting', __name__, url_prefix='/accounting')
 @permission_required('accounts:view')
 def chart_of_accounts():
     """Chart of Accounts"""
-    accounts, status = api_request('GET', '/accounting/accounts')
+    accounts, status = cached_api_get('/accounting/accounts')
     
     if status != 200:
         accounts = []
@@ -37,12 +37,13 @@ def create_account():
     response, status = api_request('POST', '/accounting/accounts', data=data)
     
     if status == 200:
+        invalidate_api_get('/accounting/accounts')
         flash('Account created', 'success')
-        return redirect(url_for('accounting.chart_of_accounts'))
+        return redirect(URLS['accounting.chart_of_accounts'])
     
     error = response.get('detail', 'Failed to create account') if response else 'Failed'
     flash(error, 'error')
-    return redirect(url_for('accounting.chart_of_accounts'))
+    return redirect(URLS['accounting.chart_of_accounts'])
 
 
 @bp.route('/journal')
@@ -64,27 +65,31 @@ def journal():
 def new_journal():
     """Create journal entry"""
     if request.method == 'GET':
-        accounts, _ = api_request('GET', '/accounting/accounts')
+        accounts, _ = cached_api_get('/accounting/accounts')
         return render_template('accounting/journal_form.html', title='New Journal Entry', accounts=accounts or [])
     
-    lines_json = request.form.get('lines_json', '[]')
+    try:
+        lines = orjson.loads(request.form.get('lines_json') or '[]')
+    except orjson.JSONDecodeError:
+        flash('Journal lines could not be read, please re-enter them', 'error')
+        return redirect(URLS['accounting.new_journal'])
     
     data = {
         'transaction_date': request.form.get('transaction_date'),
         'description': request.form.get('description'),
         'reference': request.form.get('reference'),
-        'lines': json.loads(lines_json)
+        'lines': lines
     }
     
     response, status = api_request('POST', '/accounting/journal', data=data)
     
     if status == 200:
         flash('Journal entry created', 'success')
-        return redirect(url_for('accounting.journal'))
+        return redirect(URLS['accounting.journal'])
     
     error = response.get('detail', 'Failed to create journal entry') if response else 'Failed'
     flash(error, 'error')
-    return redirect(url_for('accounting.new_journal'))
+    return redirect(URLS['accounting.new_journal'])
 
 
 @bp.route('/ledger')
@@ -1,8 +1,8 @@
 """
 Authentication Views
 """
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
-from app import api_request
+from flask import Blueprint, render_template, request, redirect, session, flash, jsonify
+from app import api_request, set_session_permissions, remember_current_user, forget_current_user, URLS
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -12,7 +12,7 @@ def login():
     """Login page"""
     if request.method == 'GET':
         if 'access_token' in session:
-            return redirect(url_for('dashboard.index'))
+            return redirect(URLS['dashboard.index'])
         return render_template('auth/login.html', title='Login')
     
     # POST - Process login
@@ -30,13 +30,13 @@ def login():
         # Fetch user data and branches
         user_data, _ = api_request('GET', '/auth/me')
         if user_data:
-            session['user_data'] = user_data
+            remember_current_user(user_data)
             session['is_superuser'] = user_data.get('is_superuser', False)
         
         # Fetch user permissions
         perms_data, _ = api_request('GET', '/auth/permissions')
         if perms_data:
-            session['permissions'] = perms_data.get('permissions', [])
+            set_session_permissions(perms_data.get('permissions', []))
         
         # Fetch branches for branch selector
         branches, _ = api_request('GET', '/settings/branches')
@@ -51,10 +51,10 @@ def login():
         # Handle HTMX request
         if request.headers.get('HX-Request'):
             response_obj = jsonify({'success': True})
-            response_obj.headers['HX-Redirect'] = url_for('dashboard.index')
+            response_obj.headers['HX-Redirect'] = URLS['dashboard.index']
             return response_obj
         
-        return redirect(url_for('dashboard.index'))
+        return redirect(URLS['dashboard.index'])
     
     error_msg = response.get('detail', 'Login failed') if response else 'Login failed'
     
@@ -70,7 +70,7 @@ def signup():
     """Signup page"""
     if request.method == 'GET':
         if 'access_token' in session:
-            return redirect(url_for('dashboard.index'))
+            return redirect(URLS['dashboard.index'])
         return render_template('auth/signup.html', title='Sign Up')
     
     # POST - Process signup
@@ -90,13 +90,13 @@ def signup():
         # Fetch user data and branches
         user_data, _ = api_request('GET', '/auth/me')
         if user_data:
-            session['user_data'] = user_data
+            remember_current_user(user_data)
             session['is_superuser'] = user_data.get('is_superuser', False)
         
         # Fetch user permissions
         perms_data, _ = api_request('GET', '/auth/permissions')
         if perms_data:
-            session['permissions'] = perms_data.get('permissions', [])
+            set_session_permissions(perms_data.get('permissions', []))
         
         # Fetch branches for branch selector
         branches, _ = api_request('GET', '/settings/branches')
@@ -110,10 +110,10 @@ def signup():
         
         if request.headers.get('HX-Request'):
             response_obj = jsonify({'success': True})
-            response_obj.headers['HX-Redirect'] = url_for('dashboard.index')
+            response_obj.headers['HX-Redirect'] = URLS['dashboard.index']
             return response_obj
         
-        return redirect(url_for('dashboard.index'))
+        return redirect(URLS['dashboard.index'])
     
     error_msg = response.get('detail', 'Signup failed') if response else 'Signup failed'
     
@@ -127,15 +127,16 @@ def signup():
 @bp.route('/logout')
 def logout():
     """Logout"""
+    forget_current_user()
     session.clear()
-    return redirect(url_for('auth.login'))
+    return redirect(URLS['auth.login'])
 
 
 @bp.route('/refresh-permissions', methods=['POST'])
 def refresh_permissions():
     """Refresh permissions in session"""
     if 'access_token' not in session:
-        return redirect(url_for('auth.login'))
+        return redirect(URLS['auth.login'])
     
     # Fetch user permissions
     perms_data, status = api_request('GET', '/auth/permissions')
@@ -146,7 +147,7 @@ def refresh_permissions():
     print(f"[DEBUG] Full response: {perms_data}")
     
     if perms_data:
-        session['permissions'] = perms_data.get('permissions', [])
+        set_session_permissions(perms_data.get('permissions', []))
         session.modified = True
         
         print(f"[DEBUG] User: {session.get('username')}")
@@ -160,7 +161,7 @@ def refresh_permissions():
         print(f"[DEBUG] No data received from API!")
     
     # Redirect back to the same page
-    return redirect(request.referrer or url_for('dashboard.index'))
+    return redirect(request.referrer or URLS['dashboard.index'])
 
 
 @bp.route('/change-password', methods=['GET', 'POST'])
@@ -181,7 +182,7 @@ def change_password():
         if request.headers.get('HX-Request'):
             return render_template('auth/partials/password_changed.html')
         flash('Password changed successfully', 'success')
-        return redirect(url_for('settings.index'))
+        return redirect(URLS['settings.index'])
     
     error_msg = response.get('detail', 'Failed to change password') if response else 'Failed to change password'
     
@@ -1,8 +1,8 @@
 """
 Banking Views
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from app import api_request, login_required, permission_required
+from flask import Blueprint, render_template, request, redirect, flash
+from app import api_request, api_request_many, cached_api_get, invalidate_api_get, login_required, permission_required, URLS
 
 bp = Blueprint('banking', __name__, url_prefix='/banking')
 
@@ -12,7 +12,7 @@ bp = Blueprint('banking', __name__, url_prefix='/banking')
 @permission_required('banking:view')
 def list_accounts():
     """List all bank accounts"""
-    accounts, status = api_request('GET', '/banking/accounts')
+    accounts, status = cached_api_get('/banking/accounts')
     
     if status != 200:
         accounts = []
@@ -26,7 +26,7 @@ def list_accounts():
 def new_account():
     """Create new bank account"""
     if request.method == 'GET':
-        coa_accounts, _ = api_request('GET', '/accounting/accounts')
+        coa_accounts, _ = cached_api_get('/accounting/accounts')
         return render_template('banking/account_form.html', title='New Bank Account', coa_accounts=coa_accounts or [])
     
     data = {
@@ -40,8 +40,9 @@ def new_account():
     response, status = api_request('POST', '/banking/accounts', data=data)
     
     if status == 200:
+        invalidate_api_get('/banking/accounts')
         flash('Bank account created', 'success')
-        return redirect(url_for('banking.list_accounts'))
+        return redirect(URLS['banking.list_accounts'])
     
     error = response.get('detail', 'Failed to create bank account') if response else 'Failed'
     flash(error, 'error')
@@ -57,7 +58,7 @@ def view_account(account_id):
     
     if status != 200:
         flash('Account not found', 'error')
-        return redirect(url_for('banking.list_accounts'))
+        return redirect(URLS['banking.list_accounts'])
     
     return render_template('banking/account_detail.html',
                           title=account.get('account_name', 'Bank Account'),
@@ -69,8 +70,10 @@ def view_account(account_id):
 @permission_required('banking:view')
 def transfers():
     """Fund transfers"""
-    transfers, status = api_request('GET', '/banking/transfers')
-    accounts, _ = api_request('GET', '/banking/accounts')
+    (transfers, status), (accounts, _) = api_request_many([
+        ('GET', '/banking/transfers'),
+        ('GET', '/banking/accounts'),
+    ])
     
     if status != 200:
         transfers = []
@@ -95,12 +98,13 @@ def new_transfer():
     response, status = api_request('POST', '/banking/transfers', data=data)
     
     if status == 200:
+        invalidate_api_get('/banking/accounts')
         flash('Transfer completed', 'success')
-        return redirect(url_for('banking.transfers'))
+        return redirect(URLS['banking.transfers'])
     
     error = response.get('detail', 'Failed to create transfer') if response else 'Failed'
     flash(error, 'error')
-    return redirect(url_for('banking.transfers'))
+    return redirect(URLS['banking.transfers'])
 
 
 @bp.route('/reconciliation')
@@ -108,6 +112,6 @@ def new_transfer():
 @permission_required('banking:view')
 def reconciliation():
     """Bank Reconciliation"""
-    accounts, status = api_request('GET', '/banking/accounts')
+    accounts, status = cached_api_get('/banking/accounts')
     
     return render_template('banking/reconciliation.html', title='Bank Reconciliation', accounts=accounts or [])
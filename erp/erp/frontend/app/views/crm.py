@@ -2,7 +2,7 @@
 CRM Views - Customers and Vendors
 """
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
-from app import api_request, login_required, permission_required
+from app import api_request, login_required, permission_required, URLS
 
 bp = Blueprint('crm', __name__, url_prefix='/crm')
 
@@ -45,7 +45,7 @@ def new_customer():
         if request.headers.get('HX-Request'):
             return render_template('crm/partials/customer_row.html', customer=response)
         flash('Customer created successfully', 'success')
-        return redirect(url_for('crm.list_customers'))
+        return redirect(URLS['crm.list_customers'])
     
     error = response.get('detail', 'Failed to create customer') if response else 'Failed to create customer'
     
@@ -66,7 +66,7 @@ def view_customer(customer_id):
     
     if status != 200:
         flash('Customer not found', 'error')
-        return redirect(url_for('crm.list_customers'))
+        return redirect(URLS['crm.list_customers'])
     
     return render_template('crm/customer_detail.html', title=customer.get('name', 'Customer'), customer=customer, balance=balance)
 
@@ -80,10 +80,11 @@ def edit_customer(customer_id):
         customer, status = api_request('GET', f'/crm/customers/{customer_id}')
         if status != 200:
             flash('Customer not found', 'error')
-            return redirect(url_for('crm.list_customers'))
+            return redirect(URLS['crm.list_customers'])
         return render_template('crm/customer_form.html', title='Edit Customer', customer=customer)
     
-    data = {k: v for k, v in request.form.items() if k != 'csrf_token'}
+    data = request.form.to_dict()
+    data.pop('csrf_token', None)
     
     response, status = api_request('PUT', f'/crm/customers/{customer_id}', data=data)
     
@@ -126,6 +127,16 @@ def list_vendors():
     return render_template('crm/vendors.html', title='Vendors', vendors=vendors)
 
 
+@bp.route('/vendors/search')
+@login_required
+@permission_required('vendors:view', 'bills:create')
+def search_vendors():
+    """Vendor lookup for form typeaheads"""
+    params = {'q': request.args.get('q', ''), 'limit': request.args.get('limit', 20, type=int)}
+    vendors, status = api_request('GET', '/crm/vendors/search', params=params)
+    return jsonify(vendors) if status == 200 else jsonify([])
+
+
 @bp.route('/vendors/new', methods=['GET', 'POST'])
 @login_required
 @permission_required('vendors:create')
@@ -148,7 +159,7 @@ def new_vendor():
         if request.headers.get('HX-Request'):
             return render_template('crm/partials/vendor_row.html', vendor=response)
         flash('Vendor created successfully', 'success')
-        return redirect(url_for('crm.list_vendors'))
+        return redirect(URLS['crm.list_vendors'])
     
     error = response.get('detail', 'Failed to create vendor') if response else 'Failed to create vendor'
     flash(error, 'error')
@@ -165,6 +176,6 @@ def view_vendor(vendor_id):
     
     if status != 200:
         flash('Vendor not found', 'error')
-        return redirect(url_for('crm.list_vendors'))
+        return redirect(URLS['crm.list_vendors'])
     
     return render_template('crm/vendor_detail.html', title=vendor.get('name', 'Vendor'), vendor=vendor, balance=balance)
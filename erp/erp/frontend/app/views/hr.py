@@ -2,8 +2,7 @@
 HR Views
 """
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from app import api_request, login_required, permission_required
-import json
+from app import api_request, login_required, permission_required, URLS
 
 bp = Blueprint('hr', __name__, url_prefix='/hr')
 
@@ -70,7 +69,7 @@ def view_employee(employee_id):
     
     if status != 200:
         flash('Employee not found', 'error')
-        return redirect(url_for('hr.list_employees'))
+        return redirect(URLS['hr.list_employees'])
     
     return render_template('hr/employee_detail.html',
                           title=employee.get('full_name', 'Employee'),
@@ -86,10 +85,11 @@ def edit_employee(employee_id):
         employee, status = api_request('GET', f'/hr/employees/{employee_id}')
         if status != 200:
             flash('Employee not found', 'error')
-            return redirect(url_for('hr.list_employees'))
+            return redirect(URLS['hr.list_employees'])
         return render_template('hr/employee_form.html', title='Edit Employee', employee=employee)
     
-    data = {k: v for k, v in request.form.items() if k != 'csrf_token'}
+    data = request.form.to_dict()
+    data.pop('csrf_token', None)
     
     response, status = api_request('PUT', f'/hr/employees/{employee_id}', data=data)
     
@@ -133,6 +133,6 @@ def view_payslip(payslip_id):
     
     if status != 200:
         flash('Payslip not found', 'error')
-        return redirect(url_for('hr.payslips'))
+        return redirect(URLS['hr.payslips'])
     
     return render_template('hr/payslip_detail.html', title='Payslip', payslip=payslip)
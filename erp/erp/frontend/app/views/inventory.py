@@ -1,8 +1,8 @@
 """
 Inventory Views
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
-from app import api_request, login_required, permission_required
+from flask import Blueprint, render_template, request, redirect, flash, jsonify, session
+from app import api_request, api_get_many, cached_api_get, invalidate_api_get, login_required, permission_required, URLS
 
 bp = Blueprint('inventory', __name__, url_prefix='/inventory')
 
@@ -14,7 +14,7 @@ bp = Blueprint('inventory', __name__, url_prefix='/inventory')
 @permission_required('categories:view')
 def list_categories():
     """List all categories"""
-    categories, status = api_request('GET', '/inventory/categories')
+    categories, status = cached_api_get('/inventory/categories')
     
     if status != 200:
         categories = []
@@ -35,10 +35,11 @@ def create_category():
     response, status = api_request('POST', '/inventory/categories', data=data)
     
     if status == 200:
+        invalidate_api_get('/inventory/categories')
         if request.headers.get('HX-Request'):
             return render_template('inventory/partials/category_row.html', category=response)
         flash('Category created', 'success')
-        return redirect(url_for('inventory.list_categories'))
+        return redirect(URLS['inventory.list_categories'])
     
     error = response.get('detail', 'Failed to create category') if response else 'Failed'
     return render_template('shared/partials/error_alert.html', error=error)
@@ -64,6 +65,7 @@ def edit_category(category_id):
     response, status = api_request('PUT', f'/inventory/categories/{category_id}', data=data)
     
     if status == 200:
+        invalidate_api_get('/inventory/categories')
         return render_template('inventory/partials/category_row.html', category=response)
     
     return render_template('shared/partials/error_alert.html', error='Failed to update')
@@ -88,6 +90,7 @@ def delete_category(category_id):
     response, status = api_request('DELETE', f'/inventory/categories/{category_id}')
     
     if status == 200:
+        invalidate_api_get('/inventory/categories')
         return ''
     
     return jsonify({'error': 'Cannot delete category with products'}), 400
@@ -100,8 +103,10 @@ def delete_category(category_id):
 @permission_required('products:view')
 def list_products():
     """List all products"""
-    products, status = api_request('GET', '/inventory/products')
-    categories, _ = api_request('GET', '/inventory/categories')
+    (products, status), (categories, _) = api_get_many(
+        ['/inventory/products', '/inventory/categories'],
+        cached={'/inventory/categories'}
+    )
     
     if status != 200:
         products = []
@@ -109,6 +114,16 @@ def list_products():
     return render_template('inventory/products.html', title='Products', products=products, categories=categories or [])
 
 
+@bp.route('/products/search')
+@login_required
+@permission_required('products:view', 'bills:create')
+def search_products():
+    """Product lookup for form typeaheads"""
+    params = {'q': request.args.get('q', ''), 'limit': request.args.get('limit', 20, type=int)}
+    products, status = api_request('GET', '/inventory/products/search', params=params)
+    return jsonify(products) if status == 200 else jsonify([])
+
+
 @bp.route('/products/low-stock')
 @login_required
 @permission_required('products:view')
@@ -128,7 +143,7 @@ def low_stock():
 def new_product():
     """Create new product"""
     if request.method == 'GET':
-        categories, _ = api_request('GET', '/inventory/categories')
+        categories, _ = cached_api_get('/inventory/categories')
         return render_template('inventory/product_form.html', 
                               title='New Product', 
                               product=None,
@@ -151,10 +166,10 @@ def new_product():
     
     if status == 200:
         flash('Product created', 'success')
-        return redirect(url_for('inventory.list_products'))
+        return redirect(URLS['inventory.list_products'])
     
     error = response.get('detail', 'Failed to create product') if response else 'Failed'
-    categories, _ = api_request('GET', '/inventory/categories')
+    categories, _ = cached_api_get('/inventory/categories')
     return render_template('inventory/product_form.html', 
                           title='New Product',
                           product=None,
@@ -171,7 +186,7 @@ def view_product(product_id):
     
     if status != 200:
         flash('Product not found', 'error')
-        return redirect(url_for('inventory.list_products'))
+        return redirect(URLS['inventory.list_products'])
     
     return render_template('inventory/product_detail.html', title=product.get('name', 'Product'), product=product)
 
@@ -182,14 +197,17 @@ def view_product(product_id):
 def edit_product(product_id):
     """Edit product"""
     if request.method == 'GET':
-        product, status = api_request('GET', f'/inventory/products/{product_id}')
-        categories, _ = api_request('GET', '/inventory/categories')
+        (product, status), (categories, _) = api_get_many(
+            [f'/inventory/products/{product_id}', '/inventory/categories'],
+            cached={'/inventory/categories'}
+        )
         if status != 200:
             return 'Product not found', 404
         return render_template('inventory/partials/product_row_edit.html', product=product, categories=categories or [])
     
     # PUT
-    data = {k: v for k, v in request.form.items() if k != 'csrf_token'}
+    data = request.form.to_dict()
+    data.pop('csrf_token', None)
     
     response, status = api_request('PUT', f'/inventory/products/{product_id}', data=data)
     
@@ -2,8 +2,8 @@
 Purchases Views
 """
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-from app import api_request, login_required, permission_required
-import json
+from app import api_request, login_required, permission_required, URLS
+import orjson
 
 bp = Blueprint('purchases', __name__, url_prefix='/purchases')
 
@@ -30,16 +30,15 @@ def list_bills():
 def new_bill():
     """Create new purchase bill"""
     if request.method == 'GET':
-        vendors, _ = api_request('GET', '/crm/vendors')
-        products, _ = api_request('GET', '/inventory/products')
-        
-        return render_template('purchases/bill_form.html',
-                              title='New Purchase Bill',
-                              vendors=vendors or [],
-                              products=products or [])
+        # Vendors and products are looked up on demand by the form
+        return render_template('purchases/bill_form.html', title='New Purchase Bill')
     
     # POST
-    items_json = request.form.get('items_json', '[]')
+    try:
+        items = orjson.loads(request.form.get('items_json') or '[]')
+    except orjson.JSONDecodeError:
+        flash('Bill items could not be read, please re-enter them', 'error')
+        return redirect(URLS['purchases.new_bill'])
     
     data = {
         'vendor_id': request.form.get('vendor_id'),
@@ -47,7 +46,7 @@ def new_bill():
         'due_date': request.form.get('due_date'),
         'bill_number': request.form.get('bill_number'),
         'notes': request.form.get('notes'),
-        'items': json.loads(items_json)
+        'items': items
     }
     
     response, status = api_request('POST', '/purchases/bills', data=data)
@@ -58,7 +57,7 @@ def new_bill():
     
     error = response.get('detail', 'Failed to create bill') if response else 'Failed'
     flash(error, 'error')
-    return redirect(url_for('purchases.new_bill'))
+    return redirect(URLS['purchases.new_bill'])
 
 
 @bp.route('/bills/<int:bill_id>')
@@ -70,7 +69,7 @@ def view_bill(bill_id):
     
     if status != 200:
         flash('Bill not found', 'error')
-        return redirect(url_for('purchases.list_bills'))
+        return redirect(URLS['purchases.list_bills'])
     
     return render_template('purchases/bill_detail.html',
                           title=f"Bill {bill.get('bill_number', '')}",
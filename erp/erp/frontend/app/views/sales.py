@@ -3,11 +3,14 @@ Sales Views
 """
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
 from datetime import date
-from app import api_request, login_required, permission_required
-import json
+from app import api_request, api_get_many, login_required, permission_required, URLS
+import re
 
 bp = Blueprint('sales', __name__, url_prefix='/sales')
 
+_ITEM_FIELD_RE = re.compile(r'items\[(\d+)\]\[(product_id|quantity|price)\]')
+_ITEM_FIELD_TYPES = {'product_id': int, 'quantity': float, 'price': float}
+
 
 @bp.route('/invoices')
 @login_required
@@ -31,10 +34,10 @@ def list_invoices():
 def new_invoice():
     """Create new sales invoice"""
     if request.method == 'GET':
-        customers, _ = api_request('GET', '/crm/customers')
-        products, _ = api_request('GET', '/inventory/products')
-        next_number, _ = api_request('GET', '/sales/next-number')
-        business, _ = api_request('GET', '/settings/business')
+        (customers, _), (products, _), (next_number, _), (business, _) = api_get_many(
+            ['/crm/customers', '/inventory/products', '/sales/next-number', '/settings/business'],
+            cached={'/settings/business'}
+        )
         
         return render_template('sales/invoice_form.html', 
                               title='New Sales Invoice',
@@ -44,22 +47,30 @@ def new_invoice():
                               today=date.today().isoformat(),
                               vat_rate=business.get('vat_rate', 0) if business else 0)
     
-    # POST - Process items from form
-    items = []
-    item_index = 0
-    while f'items[{item_index}][product_id]' in request.form:
-        items.append({
-            'product_id': int(request.form.get(f'items[{item_index}][product_id]')),
-            'quantity': float(request.form.get(f'items[{item_index}][quantity]', 0)),
-            'price': float(request.form.get(f'items[{item_index}][price]', 0))
-        })
-        item_index += 1
+    # POST - Process items from form in one pass, grouping fields by line index
+    form = request.form
+    lines = {}
+    for key, value in form.items():
+        match = _ITEM_FIELD_RE.fullmatch(key)
+        if match:
+            field = match.group(2)
+            lines.setdefault(int(match.group(1)), {})[field] = _ITEM_FIELD_TYPES[field](value)
+    
+    items = [
+        {
+            'product_id': line['product_id'],
+            'quantity': line.get('quantity', 0.0),
+            'price': line.get('price', 0.0)
+        }
+        for _, line in sorted(lines.items())
+        if 'product_id' in line
+    ]
     
     data = {
-        'customer_id': int(request.form.get('customer_id')),
-        'invoice_date': request.form.get('invoice_date'),
-        'due_date': request.form.get('due_date') or None,
-        'notes': request.form.get('notes'),
+        'customer_id': form.get('customer_id', type=int),
+        'invoice_date': form.get('invoice_date'),
+        'due_date': form.get('due_date') or None,
+        'notes': form.get('notes'),
         'items': items
     }
     
@@ -71,7 +82,7 @@ def new_invoice():
     
     error = response.get('detail', 'Failed to create invoice') if response else 'Failed'
     flash(error, 'error')
-    return redirect(url_for('sales.new_invoice'))
+    return redirect(URLS['sales.new_invoice'])
 
 
 @bp.route('/invoices/<int:invoice_id>')
@@ -83,7 +94,7 @@ def view_invoice(invoice_id):
     
     if status != 200:
         flash('Invoice not found', 'error')
-        return redirect(url_for('sales.list_invoices'))
+        return redirect(URLS['sales.list_invoices'])
     
     return render_template('sales/invoice_detail.html', 
                           title=f"Invoice {invoice.get('invoice_number', '')}",
@@ -158,7 +169,7 @@ def view_credit_note(credit_note_id):
     
     if status != 200:
         flash('Credit note not found', 'error')
-        return redirect(url_for('sales.list_credit_notes'))
+        return redirect(URLS['sales.list_credit_notes'])
     
     return render_template('sales/credit_note_detail.html',
                           title=f"Credit Note {credit_note.get('credit_note_number', '')}",
@@ -1,11 +1,15 @@
 """
 Settings Views
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from app import api_request, login_required, permission_required
+from flask import Blueprint, render_template, request, redirect, flash, session
+from app import api_request, api_get_many, cached_api_get, invalidate_api_get, login_required, permission_required, URLS
 
 bp = Blueprint('settings', __name__, url_prefix='/settings')
 
+# Slow-moving lists served through the reference-data cache; the views below
+# that change them invalidate the entry
+_REFERENCE_ENDPOINTS = frozenset(('/settings/business', '/settings/permissions', '/settings/roles', '/settings/branches'))
+
 
 def refresh_branches_in_session():
     """Refresh branches in session for branch selector"""
@@ -20,10 +24,10 @@ def refresh_branches_in_session():
 @permission_required('users:view', 'roles:view', 'branches:view')
 def index():
     """Settings index"""
-    business, business_status = api_request('GET', '/settings/business')
-    users, users_status = api_request('GET', '/settings/users')
-    roles, roles_status = api_request('GET', '/settings/roles')
-    branches, branches_status = api_request('GET', '/settings/branches')
+    (business, business_status), (users, users_status), (roles, roles_status), (branches, branches_status) = api_get_many(
+        ['/settings/business', '/settings/users', '/settings/roles', '/settings/branches'],
+        cached=_REFERENCE_ENDPOINTS
+    )
     
     # Ensure we have proper list objects, not error dicts
     if users_status != 200 or not isinstance(users, list):
@@ -51,7 +55,7 @@ def index():
 def business_settings():
     """Business settings"""
     if request.method == 'GET':
-        business, status = api_request('GET', '/settings/business')
+        business, status = cached_api_get('/settings/business')
         return render_template('settings/business.html', title='Business Settings', business=business or {})
     
     data = {
@@ -63,11 +67,12 @@ def business_settings():
     response, status = api_request('PUT', '/settings/business', data=data)
     
     if status == 200:
+        invalidate_api_get('/settings/business')
         flash('Business settings updated', 'success')
     else:
         flash('Failed to update settings', 'error')
     
-    return redirect(url_for('settings.business_settings'))
+    return redirect(URLS['settings.business_settings'])
 
 
 @bp.route('/business/update', methods=['POST'])
@@ -84,11 +89,12 @@ def update_business():
     response, status = api_request('PUT', '/settings/business', data=data)
     
     if status == 200:
+        invalidate_api_get('/settings/business')
         flash('Business settings updated', 'success')
     else:
         flash('Failed to update settings', 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 # ==================== BRANCHES ====================
@@ -98,7 +104,7 @@ def update_business():
 @permission_required('branches:view')
 def branches():
     """Manage branches - redirect to settings index"""
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 @bp.route('/branches/new', methods=['GET', 'POST'])
@@ -118,6 +124,7 @@ def new_branch():
     response, status = api_request('POST', '/settings/branches', data=data)
     
     if status == 200:
+        invalidate_api_get('/settings/branches')
         # Refresh branches in session so the selector shows the new branch
         refresh_branches_in_session()
         flash('Branch created', 'success')
@@ -125,7 +132,7 @@ def new_branch():
         error_msg = response.get('detail', 'Failed to create branch') if response else 'Failed to create branch'
         flash(error_msg, 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 @bp.route('/branches/<int:branch_id>/edit', methods=['GET', 'POST'])
@@ -138,7 +145,7 @@ def edit_branch(branch_id):
         
         if status != 200:
             flash('Branch not found', 'error')
-            return redirect(url_for('settings.index'))
+            return redirect(URLS['settings.index'])
         
         return render_template('settings/branch_form.html', title='Edit Branch', branch=branch)
     
@@ -150,11 +157,12 @@ def edit_branch(branch_id):
     response, status = api_request('PUT', f'/settings/branches/{branch_id}', data=data)
     
     if status == 200:
+        invalidate_api_get('/settings/branches')
         flash('Branch updated', 'success')
     else:
         flash('Failed to update branch', 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 @bp.route('/branches/<int:branch_id>/set-default', methods=['POST'])
@@ -165,12 +173,13 @@ def set_default_branch(branch_id):
     response, status = api_request('POST', f'/settings/branches/{branch_id}/set-default')
     
     if status == 200:
+        invalidate_api_get('/settings/branches')
         refresh_branches_in_session()
         flash('Default branch updated', 'success')
     else:
         flash('Failed to set default branch', 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 # ==================== ROLES ====================
@@ -180,7 +189,7 @@ def set_default_branch(branch_id):
 @permission_required('roles:view')
 def roles():
     """Manage roles - redirect to settings index"""
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 @bp.route('/roles/new', methods=['GET', 'POST'])
@@ -189,25 +198,27 @@ def roles():
 def new_role():
     """Create new role"""
     if request.method == 'GET':
-        permissions, _ = api_request('GET', '/settings/permissions')
+        permissions, _ = cached_api_get('/settings/permissions')
         return render_template('settings/role_form.html', title='New Role', permissions=permissions or [])
     
-    permission_ids = request.form.getlist('permissions')
+    form = request.form
+    permission_ids = form.getlist('permissions')
     
     data = {
-        'name': request.form.get('name'),
-        'description': request.form.get('description'),
-        'permission_ids': [int(p) for p in permission_ids]
+        'name': form.get('name'),
+        'description': form.get('description'),
+        'permission_ids': list(map(int, permission_ids))
     }
     
     response, status = api_request('POST', '/settings/roles', data=data)
     
     if status == 200:
+        invalidate_api_get('/settings/roles')
         flash('Role created', 'success')
     else:
         flash('Failed to create role', 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 @bp.route('/roles/<int:role_id>/edit', methods=['GET', 'POST'])
@@ -216,31 +227,35 @@ def new_role():
 def edit_role(role_id):
     """Edit role"""
     if request.method == 'GET':
-        role, status = api_request('GET', f'/settings/roles/{role_id}')
-        permissions, _ = api_request('GET', '/settings/permissions')
+        (role, status), (permissions, _) = api_get_many(
+            [f'/settings/roles/{role_id}', '/settings/permissions'],
+            cached=_REFERENCE_ENDPOINTS
+        )
         
         if status != 200:
             flash('Role not found', 'error')
-            return redirect(url_for('settings.index'))
+            return redirect(URLS['settings.index'])
         
         return render_template('settings/role_form.html', title='Edit Role', role=role, permissions=permissions or [])
     
-    permission_ids = request.form.getlist('permissions')
+    form = request.form
+    permission_ids = form.getlist('permissions')
     
     data = {
-        'name': request.form.get('name'),
-        'description': request.form.get('description'),
-        'permission_ids': [int(p) for p in permission_ids]
+        'name': form.get('name'),
+        'description': form.get('description'),
+        'permission_ids': list(map(int, permission_ids))
     }
     
     response, status = api_request('PUT', f'/settings/roles/{role_id}', data=data)
     
     if status == 200:
+        invalidate_api_get('/settings/roles')
         flash('Role updated', 'success')
     else:
         flash('Failed to update role', 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 @bp.route('/roles/<int:role_id>/delete', methods=['POST'])
@@ -251,12 +266,13 @@ def delete_role(role_id):
     response, status = api_request('DELETE', f'/settings/roles/{role_id}')
     
     if status == 200:
+        invalidate_api_get('/settings/roles')
         flash('Role deleted', 'success')
     else:
         error_msg = response.get('detail', 'Failed to delete role') if response else 'Failed to delete role'
         flash(error_msg, 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 # ==================== USERS ====================
@@ -266,7 +282,7 @@ def delete_role(role_id):
 @permission_required('users:view')
 def users():
     """Manage users - redirect to settings index"""
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 @bp.route('/users/<int:user_id>')
@@ -278,7 +294,7 @@ def view_user(user_id):
     
     if status != 200:
         flash('User not found', 'error')
-        return redirect(url_for('settings.index'))
+        return redirect(URLS['settings.index'])
     
     return render_template('settings/user_detail.html', title=f"{user.get('username', 'User')} - Details", user=user)
 
@@ -289,23 +305,27 @@ def view_user(user_id):
 def new_user():
     """Create new user"""
     if request.method == 'GET':
-        roles_data, _ = api_request('GET', '/settings/roles')
-        branches_data, _ = api_request('GET', '/settings/branches')
+        (roles_data, _), (branches_data, _) = api_get_many(
+            ['/settings/roles', '/settings/branches'],
+            cached=_REFERENCE_ENDPOINTS
+        )
         return render_template('settings/user_form.html', title='New User', roles=roles_data or [], branches=branches_data or [])
     
+    form = request.form
+    
     data = {
-        'username': request.form.get('username'),
-        'email': request.form.get('email'),
-        'password': request.form.get('password'),
-        'is_superuser': request.form.get('is_superuser') == 'on'
+        'username': form.get('username'),
+        'email': form.get('email'),
+        'password': form.get('password'),
+        'is_superuser': form.get('is_superuser') == 'on'
     }
     
     response, status = api_request('POST', '/settings/users', data=data)
     
     if status == 200:
         # If role and branch are selected, assign the role
-        role_id = request.form.get('role_id')
-        branch_id = request.form.get('branch_id')
+        role_id = form.get('role_id')
+        branch_id = form.get('branch_id')
         if role_id and branch_id:
             user_id = response.get('id')
             assign_data = {
@@ -322,7 +342,7 @@ def new_user():
         error = response.get('detail', 'Failed to create user') if response else 'Failed'
         flash(error, 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 @bp.route('/users/<int:user_id>/edit', methods=['GET', 'POST'])
@@ -331,30 +351,33 @@ def new_user():
 def edit_user(user_id):
     """Edit user"""
     if request.method == 'GET':
-        user, status = api_request('GET', f'/settings/users/{user_id}')
-        roles_data, _ = api_request('GET', '/settings/roles')
-        branches_data, _ = api_request('GET', '/settings/branches')
+        (user, status), (roles_data, _), (branches_data, _) = api_get_many(
+            [f'/settings/users/{user_id}', '/settings/roles', '/settings/branches'],
+            cached=_REFERENCE_ENDPOINTS
+        )
         
         if status != 200:
             flash('User not found', 'error')
-            return redirect(url_for('settings.index'))
+            return redirect(URLS['settings.index'])
         
         return render_template('settings/user_form.html', title='Edit User', user=user, roles=roles_data or [], branches=branches_data or [])
     
+    form = request.form
+    
     # Update user basic info
     data = {
-        'username': request.form.get('username'),
-        'email': request.form.get('email'),
-        'is_superuser': request.form.get('is_superuser') == 'on',
-        'is_active': request.form.get('is_active') == 'on'
+        'username': form.get('username'),
+        'email': form.get('email'),
+        'is_superuser': form.get('is_superuser') == 'on',
+        'is_active': form.get('is_active') == 'on'
     }
     
     response, status = api_request('PUT', f'/settings/users/{user_id}', data=data)
     
     if status == 200:
         # If role and branch are selected, assign the role
-        role_id = request.form.get('role_id')
-        branch_id = request.form.get('branch_id')
+        role_id = form.get('role_id')
+        branch_id = form.get('branch_id')
         if role_id and branch_id:
             assign_data = {
                 'user_id': user_id,
@@ -366,7 +389,7 @@ def edit_user(user_id):
     else:
         flash('Failed to update user', 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 @bp.route('/users/<int:user_id>/delete', methods=['POST'])
@@ -382,7 +405,7 @@ def delete_user(user_id):
         error_msg = response.get('detail', 'Failed to delete user') if response else 'Failed to delete user'
         flash(error_msg, 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 @bp.route('/users/assign-role', methods=['POST'])
@@ -390,10 +413,12 @@ def delete_user(user_id):
 @permission_required('users:assign-roles')
 def assign_role():
     """Assign role to user"""
+    form = request.form
+    
     data = {
-        'user_id': request.form.get('user_id'),
-        'branch_id': request.form.get('branch_id'),
-        'role_id': request.form.get('role_id')
+        'user_id': form.get('user_id'),
+        'branch_id': form.get('branch_id'),
+        'role_id': form.get('role_id')
     }
     
     response, status = api_request('POST', '/settings/users/assign-role', data=data)
@@ -403,7 +428,7 @@ def assign_role():
     else:
         flash('Failed to assign role', 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])
 
 
 @bp.route('/set-branch/<int:branch_id>', methods=['POST'])
@@ -414,13 +439,18 @@ def set_branch(branch_id):
     branches = session.get('branches', [])
     branch_name = next((b.get('name') for b in branches if b.get('id') == branch_id), 'Unknown')
     
-    session['selected_branch_id'] = branch_id
-    session['selected_branch_name'] = branch_name
-    
+    # Only switch once the backend confirms the user may use this branch
     response, status = api_request('POST', f'/settings/set-branch/{branch_id}')
     
+    if status == 200:
+        session['selected_branch_id'] = branch_id
+        session['selected_branch_name'] = branch_name
+    else:
+        error_msg = response.get('detail', 'Failed to switch branch') if response else 'Failed to switch branch'
+        flash(error_msg, 'error')
+    
     # Always redirect to refresh the page with new branch data
-    return redirect(request.referrer or url_for('dashboard.index'))
+    return redirect(request.referrer or URLS['dashboard.index'])
 
 
 @bp.route('/permissions/seed', methods=['POST'])
@@ -431,9 +461,11 @@ def seed_permissions():
     response, status = api_request('POST', '/settings/permissions/seed')
     
     if status == 200:
+        invalidate_api_get('/settings/permissions')
+        invalidate_api_get('/settings/roles')
         flash('Permissions synced successfully. Admin role updated with all permissions.', 'success')
     else:
         error_msg = response.get('detail', 'Failed to seed permissions') if response else 'Failed to seed permissions'
         flash(error_msg, 'error')
     
-    return redirect(url_for('settings.index'))
+    return redirect(URLS['settings.index'])